@@ -0,0 +1,48 @@
+"""Add foreign key indexes
+
+Revision ID: 3f9a2c7d81b4
+Revises: e178db177941
+Create Date: 2026-10-18 09:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c7d81b4'
+down_revision: Union[str, Sequence[str], None] = 'e178db177941'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_students_classroom_id'), ['classroom_id'], unique=False)
+
+    with op.batch_alter_table('groups', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_groups_classroom_id'), ['classroom_id'], unique=False)
+
+    with op.batch_alter_table('drawing_history', schema=None) as batch_op:
+        batch_op.create_index('ix_drawing_history_classroom_id_drawing_date', ['classroom_id', 'drawing_date'], unique=False)
+
+    with op.batch_alter_table('student_group_association', schema=None) as batch_op:
+        batch_op.create_index('ix_student_group_association_group_id', ['group_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('student_group_association', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_group_association_group_id')
+
+    with op.batch_alter_table('drawing_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_drawing_history_classroom_id_drawing_date')
+
+    with op.batch_alter_table('groups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_groups_classroom_id'))
+
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_students_classroom_id'))
@@ -0,0 +1,55 @@
+"""Normalize drawing history entries
+
+Revision ID: 8c41d5e0a6f2
+Revises: 3f9a2c7d81b4
+Create Date: 2026-10-18 10:04:17.882140
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d5e0a6f2'
+down_revision: Union[str, Sequence[str], None] = '3f9a2c7d81b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    entries = op.create_table('drawing_history_entries',
+    sa.Column('history_id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['history_id'], ['drawing_history.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('history_id', 'student_id')
+    )
+    with op.batch_alter_table('drawing_history_entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_drawing_history_entries_student_id'), ['student_id'], unique=False)
+
+    # Backfill from the JSON snapshot, skipping students that no longer exist.
+    bind = op.get_bind()
+    existing_student_ids = {row[0] for row in bind.execute(sa.text("SELECT id FROM students"))}
+    rows = []
+    for history_id, drawn_students in bind.execute(sa.text("SELECT id, drawn_students FROM drawing_history")):
+        if isinstance(drawn_students, str):
+            drawn_students = json.loads(drawn_students)
+        student_ids = {student.get('id') for student in drawn_students or []}
+        rows.extend(
+            {'history_id': history_id, 'student_id': student_id}
+            for student_id in student_ids & existing_student_ids
+        )
+    if rows:
+        op.bulk_insert(entries, rows)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('drawing_history_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_drawing_history_entries_student_id'))
+
+    op.drop_table('drawing_history_entries')
@@ -0,0 +1,57 @@
+"""Add student decayed score
+
+Revision ID: b7e39f1c04d8
+Revises: 8c41d5e0a6f2
+Create Date: 2026-10-18 11:21:53.410927
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e39f1c04d8'
+down_revision: Union[str, Sequence[str], None] = '8c41d5e0a6f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_DECAY_HALF_LIFE_DAYS = 14.0
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('decayed_score', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('score_updated_at', sa.DateTime(), nullable=True))
+
+    # Seed the decayed scores from the existing history with the default half-life.
+    bind = op.get_bind()
+    now = datetime.datetime.utcnow()
+    scores = {}
+    draws = bind.execute(sa.text(
+        "SELECT e.student_id, h.drawing_date FROM drawing_history_entries e "
+        "JOIN drawing_history h ON h.id = e.history_id"
+    ))
+    for student_id, drawing_date in draws:
+        if isinstance(drawing_date, str):
+            drawing_date = datetime.datetime.fromisoformat(drawing_date)
+        elapsed_days = max((now - drawing_date).total_seconds(), 0) / 86400
+        scores[student_id] = scores.get(student_id, 0.0) + 0.5 ** (elapsed_days / DEFAULT_DECAY_HALF_LIFE_DAYS)
+
+    bind.execute(sa.text("UPDATE students SET decayed_score = 0"))
+    if scores:
+        bind.execute(
+            sa.text("UPDATE students SET decayed_score = :score, score_updated_at = :now WHERE id = :id")
+            .bindparams(sa.bindparam('now', type_=sa.DateTime())),
+            [{'id': student_id, 'score': score, 'now': now} for student_id, score in scores.items()],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.drop_column('score_updated_at')
+        batch_op.drop_column('decayed_score')
@@ -0,0 +1,32 @@
+"""Add drawing history idempotency key
+
+Revision ID: d25c8e9b7a13
+Revises: b7e39f1c04d8
+Create Date: 2026-10-18 13:47:09.215664
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd25c8e9b7a13'
+down_revision: Union[str, Sequence[str], None] = 'b7e39f1c04d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('drawing_history', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(), nullable=True))
+        batch_op.create_unique_constraint('uq_drawing_history_classroom_id_idempotency_key', ['classroom_id', 'idempotency_key'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('drawing_history', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_drawing_history_classroom_id_idempotency_key', type_='unique')
+        batch_op.drop_column('idempotency_key')
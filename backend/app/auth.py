@@ -1,4 +1,9 @@
 
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -10,13 +15,16 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 import os
 
-from . import crud, models
+from . import crud, models, schemas
+from .cache import token_cache
 from .database import get_db
 
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_BACKLOG = int(os.getenv("PASSWORD_HASH_MAX_BACKLOG", 32))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -35,6 +43,67 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+class PasswordHashPool:
+    """
+    Runs bcrypt on a dedicated, size-bounded thread pool.
+    Work beyond the configured backlog is rejected with a 503 instead of queueing forever.
+    """
+
+    def __init__(self, max_workers: int, max_backlog: int):
+        self.max_workers = max_workers
+        self.max_backlog = max_backlog
+        self.rejected = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.max_workers)
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_backlog:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent authentication requests, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future: Future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_backlog": self.max_backlog,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+        }
+
+
+password_hash_pool = PasswordHashPool(max_workers=PASSWORD_HASH_WORKERS, max_backlog=PASSWORD_HASH_MAX_BACKLOG)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await asyncio.wrap_future(password_hash_pool.submit(verify_password, plain_password, hashed_password))
+
+
+async def get_password_hash_async(password) -> str:
+    return await asyncio.wrap_future(password_hash_pool.submit(get_password_hash, password))
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -46,6 +115,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def get_token_expiry(token: str) -> Optional[float]:
+    """Returns the `exp` claim of a token already verified by get_current_user."""
+    return jwt.get_unverified_claims(token).get("exp")
+
+
 
 
 
@@ -53,12 +127,22 @@ def get_user(db: Session, username: str):
     return crud.get_user_by_username(db, username=username)
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """
+    Resolves the bearer token to a user snapshot.
+    Verified tokens are cached until their `exp` claim, so repeated requests
+    skip both the JWT decode and the user query.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+    cached_user = token_cache.get(token_key)
+    if cached_user is not None:
+        return cached_user
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -70,7 +154,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     user = get_user(db, username=token_data.username)
     if user is None:
         raise credentials_exception
-    return user
+
+    user_snapshot = schemas.UserInDB.model_validate(user)
+    ttl = token_cache.ttl
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token_key, user_snapshot, ttl=ttl)
+    return user_snapshot
 
 
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+ROSTER_CACHE_SIZE = int(os.getenv("ROSTER_CACHE_SIZE", 256))
+ROSTER_CACHE_TTL_SECONDS = float(os.getenv("ROSTER_CACHE_TTL_SECONDS", 300))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", 300))
+DRAW_SESSION_CACHE_SIZE = int(os.getenv("DRAW_SESSION_CACHE_SIZE", 1024))
+DRAW_SESSION_TTL_SECONDS = float(os.getenv("DRAW_SESSION_TTL_SECONDS", 900))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 32))
+PROFILE_TTL_SECONDS = float(os.getenv("PROFILE_TTL_SECONDS", 3600))
+STREAM_TICKET_CACHE_SIZE = int(os.getenv("STREAM_TICKET_CACHE_SIZE", 1024))
+STREAM_TICKET_TTL_SECONDS = float(os.getenv("STREAM_TICKET_TTL_SECONDS", 30))
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Removes the entry and returns its value, if it had not expired."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return entry[0]
+
+    def invalidate(self, predicate: Callable[[Hashable, Any], bool]):
+        with self._lock:
+            for key in [key for key, (value, _) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class RosterCache(LRUCache):
+    """
+    Caches classroom rosters keyed by (classroom_id, group_id).
+    Each classroom carries a generation number bumped on every write, so a
+    roster loaded before a concurrent write is never stored after it.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__("roster", maxsize, ttl)
+        self._epoch = 0
+        self._generations: Dict[int, int] = {}
+
+    def generation(self, classroom_id: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._generations.get(classroom_id, 0)
+
+    def epoch(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def set_if_current(self, key: Tuple[int, Optional[int]], value: Any, generation: Tuple[int, int]):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if (self._epoch, self._generations.get(key[0], 0)) == generation:
+                self._store(key, value)
+
+    def invalidate_classroom(self, classroom_id: int):
+        with self._lock:
+            self._generations[classroom_id] = self._generations.get(classroom_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == classroom_id]:
+                del self._entries[key]
+
+    def invalidate_all(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+
+roster_cache = RosterCache(maxsize=ROSTER_CACHE_SIZE, ttl=ROSTER_CACHE_TTL_SECONDS)
+
+# Maps a SHA-256 of a bearer token to the user it resolved to.
+token_cache = LRUCache("token", maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+# Pending draws waiting for confirmation, keyed by session id.
+draw_session_cache = LRUCache("draw_session", maxsize=DRAW_SESSION_CACHE_SIZE, ttl=DRAW_SESSION_TTL_SECONDS)
+
+# Reports of profiled requests, keyed by profile id.
+profile_cache = LRUCache("profile", maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_TTL_SECONDS)
+
+# Single-use event stream tickets, mapping to (classroom_id, access token expiry).
+stream_ticket_cache = LRUCache("stream_ticket", maxsize=STREAM_TICKET_CACHE_SIZE, ttl=STREAM_TICKET_TTL_SECONDS)
+
+CACHES = [roster_cache, token_cache, draw_session_cache, profile_cache, stream_ticket_cache]
@@ -0,0 +1,97 @@
+import os
+from typing import List
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .etags import encoded_etag
+
+# Encodings in order of preference; an empty value disables compression.
+COMPRESSION_ENCODINGS = [
+    encoding.strip() for encoding in os.getenv("COMPRESSION_ENCODINGS", "br,gzip").split(",") if encoding.strip()
+]
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+GZIP_COMPRESSLEVEL = int(os.getenv("GZIP_COMPRESSLEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.process(body)
+        return compressed + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for item in accept_encoding.split(","):
+        encoding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses larger than `minimum_size` with the first of
+    `encodings` the client accepts. Built on Starlette's gzip responders, so
+    event streams and already encoded responses pass through untouched.
+    Strong ETags of compressed responses get the content-coding as a suffix.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        encodings: List[str],
+        minimum_size: int = 1024,
+        gzip_compresslevel: int = 6,
+        brotli_quality: int = 4,
+    ):
+        unknown = set(encodings) - {"br", "gzip"}
+        if unknown:
+            raise ValueError(f"Unsupported compression encodings: {', '.join(sorted(unknown))}")
+        self.app = app
+        self.encodings = encodings
+        self.minimum_size = minimum_size
+        self.gzip_compresslevel = gzip_compresslevel
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        encoding = next((encoding for encoding in self.encodings if encoding in accepted), None)
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_compresslevel)
+        else:
+            await IdentityResponder(self.app, self.minimum_size)(scope, receive, send)
+            return
+
+        async def send_with_encoded_etag(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if etag and headers.get("content-encoding") == encoding:
+                    headers["etag"] = encoded_etag(etag, encoding)
+            await send(message)
+
+        await responder(scope, receive, send_with_encoded_etag)
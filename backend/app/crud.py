@@ -1,16 +1,66 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import DateTime, and_, case, delete, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import base64
+import json
 
 from . import models, schemas
+from .cache import roster_cache, token_cache
+from .events import event_broker
 from .services import drawing_service
 
+# Eager-loading strategies matching the nesting of the response schemas,
+# so serialization never falls back to per-row lazy loads.
+
+STUDENT_LOAD_OPTIONS = (
+    selectinload(models.Student.groups),
+)
+
+GROUP_LOAD_OPTIONS = (
+    selectinload(models.Group.students).selectinload(models.Student.groups),
+)
+
+CLASSROOM_LOAD_OPTIONS = (
+    selectinload(models.Classroom.students).selectinload(models.Student.groups),
+    selectinload(models.Classroom.groups).selectinload(models.Group.students).selectinload(models.Student.groups),
+)
+
+def _student_event_payload(student) -> dict:
+    return {"id": student.id, "name": student.name, "draw_count": student.draw_count, "classroom_id": student.classroom_id}
+
 # Classroom CRUD
 
 def get_classroom(db: Session, classroom_id: int):
-    return db.query(models.Classroom).filter(models.Classroom.id == classroom_id).first()
+    return db.query(models.Classroom).options(*CLASSROOM_LOAD_OPTIONS).filter(models.Classroom.id == classroom_id).first()
+
+def classroom_exists(db: Session, classroom_id: int) -> bool:
+    return db.scalar(select(models.Classroom.id).where(models.Classroom.id == classroom_id)) is not None
 
 def list_classrooms(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Classroom).offset(skip).limit(limit).all()
+    return db.query(models.Classroom).options(*CLASSROOM_LOAD_OPTIONS).order_by(models.Classroom.id).offset(skip).limit(limit).all()
+
+def list_classroom_summaries(db: Session, skip: int = 0, limit: int = 100):
+    """Returns (id, name, student_count, group_count) rows computed in SQL, without loading relationships."""
+    student_count = (
+        select(func.count(models.Student.id))
+        .where(models.Student.classroom_id == models.Classroom.id)
+        .correlate(models.Classroom)
+        .scalar_subquery()
+    )
+    group_count = (
+        select(func.count(models.Group.id))
+        .where(models.Group.classroom_id == models.Classroom.id)
+        .correlate(models.Classroom)
+        .scalar_subquery()
+    )
+    return db.query(
+        models.Classroom.id,
+        models.Classroom.name,
+        student_count.label("student_count"),
+        group_count.label("group_count"),
+    ).order_by(models.Classroom.id).offset(skip).limit(limit).all()
 
 def create_classroom(db: Session, classroom: schemas.ClassroomCreate):
     db_classroom = models.Classroom(name=classroom.name)
@@ -22,87 +72,317 @@ def create_classroom(db: Session, classroom: schemas.ClassroomCreate):
 def delete_classroom(db: Session, classroom_id: int):
     db_classroom = db.query(models.Classroom).filter(models.Classroom.id == classroom_id).first()
     if db_classroom:
+        delete_drawing_history_by_classrooms(db, classroom_ids=[classroom_id])
         db.delete(db_classroom)
         db.commit()
+        roster_cache.invalidate_classroom(classroom_id)
+        event_broker.publish(classroom_id, "classroom_deleted")
     return db_classroom
 
 # Drawing History CRUD
 
-def create_drawing_history(db: Session, classroom_id: int, drawn_students: List[schemas.Student]):
+def create_drawing_history(db: Session, classroom_id: int, drawn_students: List[schemas.Student], idempotency_key: Optional[str] = None):
     """Creates a drawing history record. Does not commit."""
     drawn_students_data = [{'id': s.id, 'name': s.name} for s in drawn_students]
     db_drawing_history = models.DrawingHistory(
         classroom_id=classroom_id,
-        drawn_students=drawn_students_data
+        drawn_students=drawn_students_data,
+        idempotency_key=idempotency_key,
+        entries=[models.DrawingHistoryEntry(student_id=s.id) for s in drawn_students]
     )
     db.add(db_drawing_history)
     # The service layer is responsible for the commit
 
-def get_drawing_history_by_classroom(db: Session, classroom_id: int):
-    return db.query(models.DrawingHistory).filter(models.DrawingHistory.classroom_id == classroom_id).order_by(models.DrawingHistory.drawing_date.desc()).all()
+def get_drawing_history_by_idempotency_key(db: Session, classroom_id: int, idempotency_key: str):
+    return db.query(models.DrawingHistory).filter(
+        models.DrawingHistory.classroom_id == classroom_id,
+        models.DrawingHistory.idempotency_key == idempotency_key,
+    ).first()
+
+def encode_history_cursor(drawing_history: models.DrawingHistory) -> str:
+    payload = json.dumps([drawing_history.drawing_date.isoformat(), drawing_history.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError when the cursor was not produced by encode_history_cursor."""
+    try:
+        drawing_date, history_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(drawing_date), int(history_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def get_drawing_history_by_classroom(
+    db: Session,
+    classroom_id: int,
+    limit: Optional[int] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+    since: Optional[datetime] = None,
+):
+    """
+    Returns history newest first, keyset-paginated on (drawing_date, id).
+    `before` is the (drawing_date, id) of the last row of the previous page.
+    """
+    query = db.query(models.DrawingHistory).filter(models.DrawingHistory.classroom_id == classroom_id)
+    if since is not None:
+        query = query.filter(models.DrawingHistory.drawing_date >= since)
+    if before is not None:
+        before_date, before_id = before
+        query = query.filter(or_(
+            models.DrawingHistory.drawing_date < before_date,
+            and_(models.DrawingHistory.drawing_date == before_date, models.DrawingHistory.id < before_id),
+        ))
+    query = query.order_by(models.DrawingHistory.drawing_date.desc(), models.DrawingHistory.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def delete_drawing_history_by_classrooms(db: Session, classroom_ids: Optional[List[int]] = None):
+    """Deletes the drawing history of the given classrooms, or of all classrooms when None. Does not commit."""
+    history_ids = select(models.DrawingHistory.id)
+    history_query = db.query(models.DrawingHistory)
+    if classroom_ids is not None:
+        history_ids = history_ids.where(models.DrawingHistory.classroom_id.in_(classroom_ids))
+        history_query = history_query.filter(models.DrawingHistory.classroom_id.in_(classroom_ids))
+    db.query(models.DrawingHistoryEntry).filter(models.DrawingHistoryEntry.history_id.in_(history_ids)).delete(synchronize_session=False)
+    history_query.delete(synchronize_session=False)
+    # The service layer is responsible for the commit
 
 def delete_drawing_history_by_classroom(db: Session, classroom_id: int):
     """Deletes all drawing history for a classroom. Does not commit."""
-    db.query(models.DrawingHistory).filter(models.DrawingHistory.classroom_id == classroom_id).delete(synchronize_session=False)
-    # The service layer is responsible for the commit
+    delete_drawing_history_by_classrooms(db, classroom_ids=[classroom_id])
+
+def get_student_draw_stats(db: Session, classroom_id: int, window_starts: Dict[str, datetime]):
+    """
+    Aggregates drawing history per student of a classroom in a single GROUP BY.
+    Each row has id, name, draw_count, total, last_drawn_at and one count
+    column per entry of `window_starts`, counting draws on or after that date.
+    """
+    entry, history = models.DrawingHistoryEntry, models.DrawingHistory
+    window_columns = [
+        func.coalesce(func.sum(case((history.drawing_date >= start, 1), else_=0)), 0).label(name)
+        for name, start in window_starts.items()
+    ]
+    return db.query(
+        models.Student.id,
+        models.Student.name,
+        models.Student.draw_count,
+        func.count(history.id).label("total"),
+        func.max(history.drawing_date).label("last_drawn_at"),
+        *window_columns,
+    ).outerjoin(
+        entry, entry.student_id == models.Student.id
+    ).outerjoin(
+        history, history.id == entry.history_id
+    ).filter(
+        models.Student.classroom_id == classroom_id
+    ).group_by(models.Student.id).order_by(models.Student.name).all()
 
 # Student CRUD
 
 def get_student(db: Session, student_id: int):
     return db.query(models.Student).filter(models.Student.id == student_id).first()
 
+def reset_student_draws(db: Session, classroom_ids: Optional[List[int]] = None):
+    """Resets weights, draw counts and decayed scores with one UPDATE, for all classrooms when None. Does not commit."""
+    statement = update(models.Student).values(weight=1.0, draw_count=0, decayed_score=0.0, score_updated_at=None)
+    if classroom_ids is not None:
+        statement = statement.where(models.Student.classroom_id.in_(classroom_ids))
+    db.execute(statement.execution_options(synchronize_session=False))
+    # The service layer is responsible for the commit
+
+def increment_student_draws(db: Session, classroom_id: int, student_ids: List[int], now: datetime, half_life_days: float):
+    """
+    Atomically records one more draw for each student with a single UPDATE ... RETURNING.
+    Increments happen in SQL, so concurrent confirmations cannot lose updates.
+    Only students of the classroom are updated. Does not commit.
+    """
+    draw_count = func.coalesce(models.Student.draw_count, 0)
+    statement = (
+        update(models.Student)
+        .where(models.Student.id.in_(student_ids), models.Student.classroom_id == classroom_id)
+        .values(
+            draw_count=draw_count + 1,
+            weight=1.0 / ((draw_count + 2) * (draw_count + 2)),
+            decayed_score=func.coalesce(models.Student.decayed_score, 0.0)
+            * func.decay_factor(models.Student.score_updated_at, literal(now, DateTime), half_life_days) + 1,
+            score_updated_at=now,
+        )
+        .returning(models.Student.id, models.Student.name)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(statement).all()
+
 def get_students_by_ids(db: Session, student_ids: List[int]) -> List[models.Student]:
-    return db.query(models.Student).filter(models.Student.id.in_(student_ids)).all()
+    return db.query(models.Student).options(*STUDENT_LOAD_OPTIONS).filter(models.Student.id.in_(student_ids)).all()
 
 def list_students(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Student).offset(skip).limit(limit).all()
+    return db.query(models.Student).options(*STUDENT_LOAD_OPTIONS).order_by(models.Student.id).offset(skip).limit(limit).all()
 
 def list_students_by_classroom(db: Session, classroom_id: int, group_id: Optional[int] = None):
-    query = db.query(models.Student).filter(models.Student.classroom_id == classroom_id)
+    query = db.query(models.Student).options(*STUDENT_LOAD_OPTIONS).filter(models.Student.classroom_id == classroom_id)
     if group_id:
         query = query.join(models.student_group_association).filter(
             models.student_group_association.c.group_id == group_id
         )
     return query.all()
 
+def list_student_rows_by_classroom(db: Session, classroom_id: int, group_id: Optional[int] = None):
+    """Returns plain student column rows without building ORM objects."""
+    query = db.query(
+        models.Student.id,
+        models.Student.name,
+        models.Student.weight,
+        models.Student.draw_count,
+        models.Student.decayed_score,
+        models.Student.score_updated_at,
+        models.Student.classroom_id,
+    ).filter(models.Student.classroom_id == classroom_id)
+    if group_id:
+        query = query.join(models.student_group_association).filter(
+            models.student_group_association.c.group_id == group_id
+        )
+    return query.all()
+
+def list_group_memberships_by_classroom(db: Session, classroom_id: int):
+    """Returns (student_id, group_id, group_name, classroom_id) rows for every membership in a classroom."""
+    association = models.student_group_association
+    return db.query(
+        association.c.student_id,
+        models.Group.id,
+        models.Group.name,
+        models.Group.classroom_id,
+    ).join(models.Group, models.Group.id == association.c.group_id).filter(
+        models.Group.classroom_id == classroom_id
+    ).all()
+
 def create_student(db: Session, student: schemas.StudentCreate, classroom_id: int):
     db_student = models.Student(**student.dict(), classroom_id=classroom_id)
     db.add(db_student)
     db.commit()
+    roster_cache.invalidate_classroom(classroom_id)
     db.refresh(db_student)
+    event_broker.publish(classroom_id, "students_created", {"students": [_student_event_payload(db_student)]})
     return db_student
 
+def list_student_names_by_classroom(db: Session, classroom_id: int) -> set:
+    return set(db.scalars(select(models.Student.name).where(models.Student.classroom_id == classroom_id)))
+
+def bulk_create_students(db: Session, names: List[str], classroom_id: int, batch_size: int = 500):
+    """Inserts students with executemany batches inside a single transaction."""
+    if not names:
+        return
+    try:
+        for start in range(0, len(names), batch_size):
+            db.execute(insert(models.Student), [
+                {"name": name, "classroom_id": classroom_id, "weight": 1.0, "draw_count": 0, "decayed_score": 0.0}
+                for name in names[start:start + batch_size]
+            ])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise e
+    roster_cache.invalidate_classroom(classroom_id)
+    event_broker.publish(classroom_id, "roster_changed", {"created": len(names)})
+
+def _draw_count_edit(student, draw_count: int, half_life_days: float, now: datetime) -> dict:
+    """
+    Column values for an admin edit of draw_count. The difference is also
+    applied to the decayed score, as if the draws happened now, so the
+    correction affects draw probabilities under the decay policy as well.
+    """
+    values = {"draw_count": draw_count, "weight": drawing_service.calculate_weight_from_draw_count(draw_count)}
+    difference = draw_count - (student.draw_count or 0)
+    if difference:
+        score = drawing_service.decay_score(student.decayed_score, student.score_updated_at, now, half_life_days)
+        values["decayed_score"] = max(score + difference, 0.0)
+        values["score_updated_at"] = now
+    return values
+
 def update_student(db: Session, student_id: int, student: schemas.StudentUpdateAdmin):
     db_student = db.query(models.Student).filter(models.Student.id == student_id).first()
     if db_student:
+        _, half_life_days = drawing_service.get_weighting_policy(db, db_student.classroom_id)
+        values = _draw_count_edit(db_student, student.draw_count, half_life_days, datetime.utcnow())
         db_student.name = student.name
-        db_student.draw_count = student.draw_count
-        # Recalculate weight based on the new draw_count
-        db_student.weight = drawing_service.calculate_weight_from_draw_count(student.draw_count)
+        for column, value in values.items():
+            setattr(db_student, column, value)
         db.commit()
+        roster_cache.invalidate_classroom(db_student.classroom_id)
         db.refresh(db_student)
+        event_broker.publish(db_student.classroom_id, "students_updated", {"students": [_student_event_payload(db_student)]})
     return db_student
 
+def update_students(db: Session, updates: List[schemas.StudentBatchUpdate]):
+    """
+    Applies several admin edits with one executemany UPDATE in one transaction.
+    Returns None if any student does not exist.
+    """
+    student_ids = [student.id for student in updates]
+    current = {
+        row.id: row for row in db.execute(
+            select(
+                models.Student.id, models.Student.classroom_id, models.Student.draw_count,
+                models.Student.decayed_score, models.Student.score_updated_at,
+            ).where(models.Student.id.in_(student_ids))
+        ).all()
+    }
+    if len(current) != len(set(student_ids)):
+        return None
+    classroom_ids = {row.classroom_id for row in current.values()}
+
+    if updates:
+        half_life_days = {
+            classroom_id: drawing_service.get_weighting_policy(db, classroom_id)[1] for classroom_id in classroom_ids
+        }
+        now = datetime.utcnow()
+        # executemany needs the same columns in every row.
+        db.execute(update(models.Student), [
+            {
+                "decayed_score": current[student.id].decayed_score,
+                "score_updated_at": current[student.id].score_updated_at,
+                **_draw_count_edit(
+                    current[student.id], student.draw_count, half_life_days[current[student.id].classroom_id], now
+                ),
+                "id": student.id,
+                "name": student.name,
+            }
+            for student in updates
+        ])
+        db.commit()
+    for classroom_id in classroom_ids:
+        roster_cache.invalidate_classroom(classroom_id)
+    students = get_students_by_ids(db, student_ids=student_ids)
+    for classroom_id in classroom_ids:
+        event_broker.publish(classroom_id, "students_updated", {
+            "students": [_student_event_payload(student) for student in students if student.classroom_id == classroom_id]
+        })
+    return students
+
 def delete_student(db: Session, student_id: int):
     db_student = db.query(models.Student).filter(models.Student.id == student_id).first()
     if db_student:
+        db.query(models.DrawingHistoryEntry).filter(models.DrawingHistoryEntry.student_id == student_id).delete(synchronize_session=False)
         db.delete(db_student)
         db.commit()
+        roster_cache.invalidate_classroom(db_student.classroom_id)
+        event_broker.publish(db_student.classroom_id, "students_deleted", {"student_ids": [student_id]})
     return db_student
 
 # Group CRUD
 
 def get_group(db: Session, group_id: int):
-    return db.query(models.Group).filter(models.Group.id == group_id).first()
+    return db.query(models.Group).options(*GROUP_LOAD_OPTIONS).filter(models.Group.id == group_id).first()
 
 def list_groups_by_classroom(db: Session, classroom_id: int):
-    return db.query(models.Group).filter(models.Group.classroom_id == classroom_id).all()
+    return db.query(models.Group).options(*GROUP_LOAD_OPTIONS).filter(models.Group.classroom_id == classroom_id).all()
 
 def create_group(db: Session, group: schemas.GroupCreate, classroom_id: int):
     db_group = models.Group(name=group.name, classroom_id=classroom_id)
     db.add(db_group)
     db.commit()
+    roster_cache.invalidate_classroom(classroom_id)
     db.refresh(db_group)
+    event_broker.publish(classroom_id, "groups_changed", {"group_id": db_group.id})
     return db_group
 
 def delete_group(db: Session, group_id: int):
@@ -110,31 +390,62 @@ def delete_group(db: Session, group_id: int):
     if db_group:
         db.delete(db_group)
         db.commit()
+        roster_cache.invalidate_classroom(db_group.classroom_id)
+        event_broker.publish(db_group.classroom_id, "groups_changed", {"group_id": group_id})
     return db_group
 
+def add_students_to_group(db: Session, group_id: int, student_ids: List[int]):
+    """
+    Adds students of the group's classroom with a single INSERT ... SELECT ...
+    ON CONFLICT DO NOTHING, so existing memberships are left untouched.
+    Returns None if the group does not exist.
+    """
+    classroom_id = db.scalar(select(models.Group.classroom_id).where(models.Group.id == group_id))
+    if classroom_id is None:
+        return None
+    association = models.student_group_association
+    db.execute(
+        sqlite_insert(association).from_select(
+            ["student_id", "group_id"],
+            select(models.Student.id, literal(group_id)).where(
+                models.Student.id.in_(student_ids), models.Student.classroom_id == classroom_id
+            ),
+        ).on_conflict_do_nothing()
+    )
+    db.commit()
+    roster_cache.invalidate_classroom(classroom_id)
+    event_broker.publish(classroom_id, "groups_changed", {"group_id": group_id})
+    return get_group(db, group_id)
+
+def remove_students_from_group(db: Session, group_id: int, student_ids: List[int]):
+    """Removes memberships with a single DELETE ... IN. Returns None if the group does not exist."""
+    classroom_id = db.scalar(select(models.Group.classroom_id).where(models.Group.id == group_id))
+    if classroom_id is None:
+        return None
+    association = models.student_group_association
+    db.execute(
+        delete(association).where(association.c.group_id == group_id, association.c.student_id.in_(student_ids))
+    )
+    db.commit()
+    roster_cache.invalidate_classroom(classroom_id)
+    event_broker.publish(classroom_id, "groups_changed", {"group_id": group_id})
+    return get_group(db, group_id)
+
 def add_student_to_group(db: Session, group_id: int, student_id: int):
-    group = get_group(db, group_id)
-    student = get_student(db, student_id)
-    if group and student and student not in group.students:
-        group.students.append(student)
-        db.commit()
-        db.refresh(group)
-    return group
+    return add_students_to_group(db, group_id=group_id, student_ids=[student_id])
 
 def remove_student_from_group(db: Session, group_id: int, student_id: int):
-    group = get_group(db, group_id)
-    student = get_student(db, student_id)
-    if group and student and student in group.students:
-        group.students.remove(student)
-        db.commit()
-        db.refresh(group)
-    return group
+    return remove_students_from_group(db, group_id=group_id, student_ids=[student_id])
 
 # Settings CRUD
 
 def get_setting(db: Session, key: str):
     return db.query(models.Setting).filter(models.Setting.key == key).first()
 
+def get_settings(db: Session, keys: List[str]) -> Dict[str, str]:
+    rows = db.query(models.Setting.key, models.Setting.value).filter(models.Setting.key.in_(keys)).all()
+    return {row.key: row.value for row in rows}
+
 def create_or_update_setting(db: Session, setting: schemas.SettingCreate):
     db_setting = get_setting(db, key=setting.key)
     if db_setting:
@@ -143,7 +454,10 @@ def create_or_update_setting(db: Session, setting: schemas.SettingCreate):
         db_setting = models.Setting(key=setting.key, value=setting.value)
         db.add(db_setting)
     db.commit()
+    # Settings can change a classroom's weighting policy.
+    roster_cache.invalidate_all()
     db.refresh(db_setting)
+    event_broker.publish(None, "settings_changed", {"key": setting.key})
     return db_setting
 
 # User CRUD
@@ -165,5 +479,6 @@ def update_user_password_hash(db: Session, user: models.User, new_password_hash:
 
     db_user.password_hash = new_password_hash
     db.commit()
+    token_cache.invalidate(lambda _key, cached_user: cached_user.id == db_user.id)
     db.refresh(db_user)
     return db_user
@@ -1,5 +1,7 @@
+import datetime
 import os
-from sqlalchemy import create_engine
+from functools import partial
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from pathlib import Path
@@ -15,9 +17,64 @@ DATABASE_FILE.parent.mkdir(parents=True, exist_ok=True)
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DATABASE_FILE}")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# SQLite performance profile, applied to every new connection.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    # Negative values are KiB, so the default is a 20 MB page cache per connection.
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", -20000)),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", 128 * 1024 * 1024)),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+
+
+def is_file_sqlite_url(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and not url.endswith("://")
+
+
+def configure_sqlite_connection(dbapi_connection, connection_record=None, pragmas=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (SQLITE_PRAGMAS if pragmas is None else pragmas).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _decay_factor(updated_at, now, half_life_days):
+    """SQL function decay_factor(updated_at, now, half_life_days): 0.5 ** (elapsed days / half-life)."""
+    if updated_at is None:
+        return 0.0
+    elapsed = datetime.datetime.fromisoformat(now) - datetime.datetime.fromisoformat(updated_at)
+    return 0.5 ** (max(elapsed.total_seconds(), 0) / 86400 / half_life_days)
+
+
+def register_sqlite_functions(dbapi_connection, connection_record=None):
+    dbapi_connection.create_function("decay_factor", 3, _decay_factor, deterministic=True)
+
+
+def build_engine(url: str, pragmas=None):
+    if not is_file_sqlite_url(url):
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False})
+    else:
+        sqlite_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        event.listen(sqlite_engine, "connect", partial(configure_sqlite_connection, pragmas=pragmas))
+    if url.startswith("sqlite"):
+        event.listen(sqlite_engine, "connect", register_sqlite_functions)
+    return sqlite_engine
+
+
+engine = build_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -28,4 +85,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
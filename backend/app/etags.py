@@ -0,0 +1,66 @@
+import secrets
+import time
+from typing import Callable, Optional
+
+from fastapi import Request, Response, status
+
+from .cache import ROSTER_CACHE_TTL_SECONDS, roster_cache
+
+# Versions restart with the process, so ETags carry a per-boot nonce.
+BOOT_ID = secrets.token_hex(4)
+# Content-codings applied by CompressionMiddleware, which suffixes strong tags with them.
+CONTENT_CODINGS = ("br", "gzip")
+
+
+def classroom_etag(classroom_id: int, time_dependent: bool = False) -> str:
+    """
+    Strong ETag from the classroom's roster generation, which every write in
+    crud and drawing_service bumps. Must be computed before reading the data,
+    so a concurrent write can only make the tag older, never newer.
+    Time-dependent payloads (decayed weights) also roll over once per cache TTL.
+    """
+    epoch, generation = roster_cache.generation(classroom_id)
+    tag = f"{BOOT_ID}-{epoch}-{generation}"
+    if time_dependent and ROSTER_CACHE_TTL_SECONDS > 0:
+        tag += f"-{int(time.time() // ROSTER_CACHE_TTL_SECONDS)}"
+    return f'"{tag}"'
+
+
+def settings_etag() -> str:
+    """Settings writes bump the roster cache epoch."""
+    return f'"{BOOT_ID}-s{roster_cache.epoch()}"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Strong validators must differ per content-coding (RFC 9110 8.8.3)."""
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _decoded_etag(etag: str) -> str:
+    for encoding in CONTENT_CODINGS:
+        if etag.endswith(f'-{encoding}"'):
+            return etag[:-len(encoding) - 2] + '"'
+    return etag
+
+
+def not_modified(request: Request, response: Response, etag: str, exists: Callable[[], bool]) -> Optional[Response]:
+    """
+    Sets the ETag on the response and returns a 304 response when the
+    client's If-None-Match already matches it, in any content-coding.
+    `If-None-Match: *` only matches when `exists()` confirms the resource is there.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    response.headers.update(headers)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    matched = next((candidate for candidate in candidates if _decoded_etag(candidate) == etag), None)
+    if matched is None and "*" in candidates and exists():
+        matched = etag
+    if matched is not None:
+        # Echo the client's representation so the 304 keeps its content-coding's tag.
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, "ETag": matched})
+    return None
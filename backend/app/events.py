@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 64))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", 15))
+EVENT_RETRY_MS = int(os.getenv("EVENT_RETRY_MS", 3000))
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class EventBroker:
+    """
+    In-process pub/sub fan-out of classroom events to Server-Sent Events streams.
+    Subscribers are bounded asyncio queues owned by the event loop. Publishers
+    usually run in worker threads, so publish() hands the message to the loop
+    with call_soon_threadsafe. An idle subscriber costs one queue and one
+    pending get().
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def detach(self):
+        self._loop = None
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in list(self._subscribers.values()))
+
+    def publish(self, classroom_id: Optional[int], event: str, data: Optional[Dict[str, Any]] = None):
+        """Thread-safe. A classroom_id of None sends the event to every classroom."""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers:
+            return
+        message = format_sse(event, {"classroom_id": classroom_id, **(data or {})})
+        try:
+            loop.call_soon_threadsafe(self._fan_out, classroom_id, message)
+        except RuntimeError:
+            # The loop was closed while shutting down.
+            pass
+
+    def _fan_out(self, classroom_id: Optional[int], message: str):
+        if classroom_id is None:
+            queues = [queue for subscribers in self._subscribers.values() for queue in subscribers]
+        else:
+            queues = list(self._subscribers.get(classroom_id, ()))
+        for queue in queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A stalled client: drop its backlog and let it refetch instead.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(format_sse("resync", {"classroom_id": classroom_id}))
+
+    def _subscribe(self, classroom_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(classroom_id, set()).add(queue)
+        return queue
+
+    def _unsubscribe(self, classroom_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(classroom_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[classroom_id]
+
+    async def stream(self, classroom_id: int, expires_at: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yields SSE messages for one classroom, with keep-alive comments while
+        idle. Ends with an `expired` event at `expires_at` (a Unix timestamp).
+        """
+        queue = self._subscribe(classroom_id)
+        try:
+            yield f"retry: {EVENT_RETRY_MS}\n\n"
+            while True:
+                timeout = EVENT_HEARTBEAT_SECONDS
+                if expires_at is not None:
+                    remaining = expires_at - time.time()
+                    if remaining <= 0:
+                        yield format_sse("expired", {"classroom_id": classroom_id})
+                        return
+                    timeout = min(timeout, remaining)
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self._unsubscribe(classroom_id, queue)
+
+
+event_broker = EventBroker(queue_size=EVENT_QUEUE_SIZE)
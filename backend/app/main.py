@@ -1,17 +1,57 @@
-from fastapi import Depends, FastAPI, HTTPException, status, Query
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, File, Header, HTTPException, status, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from anyio import to_thread
+import codecs
+import os
+import secrets
 
-from . import crud, models, schemas, auth
+from . import crud, etags, models, schemas, auth
 from .database import engine, get_db
-from .services import drawing_service
+from .cache import CACHES, profile_cache, stream_ticket_cache
+from .compression import (
+    BROTLI_QUALITY,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_MINIMUM_SIZE,
+    GZIP_COMPRESSLEVEL,
+    CompressionMiddleware,
+)
+from .events import event_broker
+from .metrics import MetricsMiddleware, instrument_engine, registry as metrics_registry
+from .profiling import ProfilingMiddleware, ProfilingRoute, record_profiled_statements
+from .services import drawing_service, roster_import, simulation_service, stats_service
 from fastapi.middleware.cors import CORSMiddleware
 
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(root_path="/api")
+# Blocking handlers and dependencies run in this worker thread pool, never on the event loop.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 40))
+# Static bearer token for Prometheus scrapes; without it /metrics requires an admin user.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+instrument_engine(engine)
+record_profiled_statements(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    event_broker.attach(asyncio.get_running_loop())
+    yield
+    event_broker.detach()
+
+
+app = FastAPI(root_path="/api", lifespan=lifespan, default_response_class=ORJSONResponse)
+# Lets admins profile any endpoint with the X-Profile header.
+app.router.route_class = ProfilingRoute
+
+app.add_middleware(ProfilingMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,12 +64,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Profile-Id"],
 )
 
+if COMPRESSION_ENCODINGS:
+    app.add_middleware(
+        CompressionMiddleware,
+        encodings=COMPRESSION_ENCODINGS,
+        minimum_size=COMPRESSION_MINIMUM_SIZE,
+        gzip_compresslevel=GZIP_COMPRESSLEVEL,
+        brotli_quality=BROTLI_QUALITY,
+    )
+
+# Outermost, so the measured latency includes every other middleware.
+app.add_middleware(MetricsMiddleware)
+
 @app.post("/token", response_model=schemas.Token, tags=["Authentication"])
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = auth.get_user(db, username=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
+    user = await run_in_threadpool(auth.get_user, db, username=form_data.username)
+    if not user or not await auth.verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -47,17 +100,17 @@ async def read_users_me(current_user: models.User = Depends(auth.get_current_act
     return current_user
 
 @app.put("/me/password", response_model=schemas.Message, tags=["Authentication"])
-def update_password(
+async def update_password(
     password_update: schemas.PasswordUpdate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    if not auth.verify_password(password_update.current_password, current_user.password_hash):
+    if not await auth.verify_password_async(password_update.current_password, current_user.password_hash):
         raise HTTPException(status_code=400, detail="Incorrect current password")
 
-    new_password_hash = auth.get_password_hash(password_update.new_password)
-    updated_user = crud.update_user_password_hash(
-        db, user=current_user, new_password_hash=new_password_hash
+    new_password_hash = await auth.get_password_hash_async(password_update.new_password)
+    updated_user = await run_in_threadpool(
+        crud.update_user_password_hash, db, user=current_user, new_password_hash=new_password_hash
     )
     if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -74,14 +127,67 @@ def read_classrooms(skip: int = 0, limit: int = 100, db: Session = Depends(get_d
     return crud.list_classrooms(db, skip=skip, limit=limit)
 
 
+@app.get("/classrooms/summary", response_model=List[schemas.ClassroomSummary], tags=["Classrooms"])
+def read_classroom_summaries(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    return crud.list_classroom_summaries(db, skip=skip, limit=limit)
+
+
 @app.get("/classrooms/{classroom_id}", response_model=schemas.Classroom, tags=["Classrooms"])
-def read_classroom(classroom_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+def read_classroom(
+    classroom_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    cached = etags.not_modified(
+        request, response, etags.classroom_etag(classroom_id),
+        exists=lambda: crud.classroom_exists(db, classroom_id=classroom_id),
+    )
+    if cached is not None:
+        return cached
     db_classroom = crud.get_classroom(db, classroom_id=classroom_id)
     if db_classroom is None:
         raise HTTPException(status_code=404, detail="Classroom not found")
     return db_classroom
 
 
+@app.post("/classrooms/{classroom_id}/events/ticket", response_model=schemas.EventStreamTicket, tags=["Classrooms"])
+def create_event_stream_ticket(
+    classroom_id: int,
+    token: str = Depends(auth.oauth2_scheme),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Issues a short-lived, single-use ticket for the classroom's event stream,
+    so the access token never appears in a URL or in access logs.
+    """
+    if not crud.classroom_exists(db, classroom_id=classroom_id):
+        raise HTTPException(status_code=404, detail="Classroom not found")
+    ticket = secrets.token_urlsafe(24)
+    stream_ticket_cache.set(ticket, (classroom_id, auth.get_token_expiry(token)))
+    return {"ticket": ticket, "expires_in": int(stream_ticket_cache.ttl)}
+
+
+@app.get("/classrooms/{classroom_id}/events", tags=["Classrooms"])
+async def stream_classroom_events(classroom_id: int, ticket: str = Query(...)):
+    """
+    Server-Sent Events stream of draws, resets and roster edits for a classroom.
+    EventSource cannot send headers, so it authenticates with a ticket from
+    POST /classrooms/{classroom_id}/events/ticket. The stream ends with an
+    `expired` event when the access token the ticket was issued for expires.
+    """
+    entry = stream_ticket_cache.pop(ticket)
+    if entry is None or entry[0] != classroom_id:
+        raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+    return StreamingResponse(
+        event_broker.stream(classroom_id, expires_at=entry[1]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.delete("/classrooms/{classroom_id}", response_model=schemas.Classroom, tags=["Classrooms"])
 def delete_classroom(classroom_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_admin_user)):
     db_classroom = crud.delete_classroom(db, classroom_id=classroom_id)
@@ -97,10 +203,12 @@ def reset_weights(classroom_id: int, db: Session = Depends(get_db), current_user
 
 
 @app.post("/classrooms/reset-all", response_model=schemas.Message, tags=["Admin"])
-def reset_all_classrooms(db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_admin_user)):
-    classrooms = crud.list_classrooms(db, limit=1000)
-    for classroom in classrooms:
-        drawing_service.reset_classroom(db=db, classroom_id=classroom.id)
+def reset_all_classrooms(
+    classroom_ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    drawing_service.reset_classrooms(db=db, classroom_ids=classroom_ids)
     return {"message": "All classrooms have been reset successfully"}
 
 
@@ -110,13 +218,32 @@ def create_student_for_classroom(
 ):
     return crud.create_student(db=db, student=student, classroom_id=classroom_id)
 
+@app.post("/classrooms/{classroom_id}/students/import", response_model=schemas.RosterImportResult, tags=["Students"])
+def import_students_for_classroom(
+    classroom_id: int, file: UploadFile = File(...), db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)
+):
+    if not crud.classroom_exists(db, classroom_id=classroom_id):
+        raise HTTPException(status_code=404, detail="Classroom not found")
+    try:
+        return roster_import.import_roster(db, classroom_id=classroom_id, lines=codecs.iterdecode(file.file, "utf-8-sig"))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="The file must be a UTF-8 encoded CSV")
+
 @app.get("/classrooms/{classroom_id}/students", response_model=List[schemas.Student], tags=["Students"])
 def read_students_from_classroom(
     classroom_id: int,
+    request: Request,
+    response: Response,
     group_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
+    cached = etags.not_modified(
+        request, response, etags.classroom_etag(classroom_id, time_dependent=True),
+        exists=lambda: crud.classroom_exists(db, classroom_id=classroom_id),
+    )
+    if cached is not None:
+        return cached
     return drawing_service.list_students_with_probabilities(db, classroom_id=classroom_id, group_id=group_id)
 
 @app.get("/students/", response_model=List[schemas.Student], tags=["Students"])
@@ -132,6 +259,16 @@ def delete_student(student_id: int, db: Session = Depends(get_db), current_user:
     return db_student
 
 
+@app.put("/students/batch", response_model=List[schemas.Student], tags=["Students"])
+def update_students(
+    students: List[schemas.StudentBatchUpdate], db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)
+):
+    db_students = crud.update_students(db, updates=students)
+    if db_students is None:
+        raise HTTPException(status_code=404, detail="One or more students not found")
+    return db_students
+
+
 @app.put("/students/{student_id}", response_model=schemas.Student, tags=["Students"])
 def update_student(
     student_id: int, student: schemas.StudentUpdateAdmin, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)
@@ -177,7 +314,10 @@ def add_student_to_group(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_admin_user)
 ):
-    return crud.add_student_to_group(db, group_id=group_id, student_id=student_id)
+    db_group = crud.add_student_to_group(db, group_id=group_id, student_id=student_id)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return db_group
 
 @app.delete("/groups/{group_id}/students/{student_id}", response_model=schemas.Group, tags=["Groups"])
 def remove_student_from_group(
@@ -186,21 +326,48 @@ def remove_student_from_group(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_admin_user)
 ):
-    return crud.remove_student_from_group(db, group_id=group_id, student_id=student_id)
+    db_group = crud.remove_student_from_group(db, group_id=group_id, student_id=student_id)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return db_group
+
+@app.post("/groups/{group_id}/students", response_model=schemas.Group, tags=["Groups"])
+def add_students_to_group(
+    group_id: int,
+    student_ids: schemas.StudentIDs,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    db_group = crud.add_students_to_group(db, group_id=group_id, student_ids=student_ids.student_ids)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return db_group
+
+@app.delete("/groups/{group_id}/students", response_model=schemas.Group, tags=["Groups"])
+def remove_students_from_group(
+    group_id: int,
+    student_ids: schemas.StudentIDs,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    db_group = crud.remove_students_from_group(db, group_id=group_id, student_ids=student_ids.student_ids)
+    if db_group is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return db_group
 
 
 @app.get("/classrooms/{classroom_id}/students/probabilities", response_model=List[schemas.Student], tags=["Drawing"])
 def read_student_probabilities(classroom_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     return drawing_service.list_students_with_probabilities(db, classroom_id=classroom_id)
 
-@app.post("/classrooms/{classroom_id}/draw", response_model=List[schemas.Student], tags=["Drawing"])
+@app.post("/classrooms/{classroom_id}/draw", response_model=schemas.DrawResult, tags=["Drawing"])
 def draw_students_for_classroom(
     classroom_id: int,
     draw_input: schemas.DrawCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    return drawing_service.draw_students(
+    return drawing_service.start_draw_session(
         db=db,
         classroom_id=classroom_id,
         num_students=draw_input.num_students,
@@ -208,18 +375,62 @@ def draw_students_for_classroom(
         group_id=draw_input.group_id
     )
 
+@app.post("/classrooms/{classroom_id}/simulate", response_model=schemas.SimulationResult, tags=["Drawing"])
+def simulate_draws_for_classroom(
+    classroom_id: int,
+    simulation_input: schemas.SimulationCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return simulation_service.simulate_draws(db, classroom_id=classroom_id, params=simulation_input)
+
 @app.get("/classrooms/{classroom_id}/drawing-history", response_model=List[schemas.DrawingHistory], tags=["Drawing"])
-def read_drawing_history(classroom_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
-    return crud.get_drawing_history_by_classroom(db, classroom_id=classroom_id)
+def read_drawing_history(
+    classroom_id: int,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    try:
+        before = crud.decode_history_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if since is not None and since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    history = crud.get_drawing_history_by_classroom(db, classroom_id=classroom_id, limit=limit + 1, before=before, since=since)
+    if len(history) > limit:
+        history = history[:limit]
+        response.headers["X-Next-Cursor"] = crud.encode_history_cursor(history[-1])
+    return history
+
+@app.get("/classrooms/{classroom_id}/stats", response_model=schemas.ClassroomStats, tags=["Drawing"])
+def read_classroom_stats(
+    classroom_id: int,
+    window: Literal["week", "month", "term", "all"] = "term",
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return stats_service.get_classroom_stats(db, classroom_id=classroom_id, window=window)
 
-@app.post("/classrooms/{classroom_id}/confirm_draw", response_model=List[schemas.Student], tags=["Drawing"])
+@app.post("/classrooms/{classroom_id}/confirm_draw", response_model=schemas.DrawConfirmation, tags=["Drawing"])
 def confirm_draw(
     classroom_id: int,
-    student_ids: schemas.StudentIDs,
+    draw_confirm: schemas.DrawConfirm,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    return drawing_service.confirm_draw(db=db, classroom_id=classroom_id, student_ids=student_ids.student_ids)
+    return drawing_service.confirm_draw_session(
+        db=db,
+        classroom_id=classroom_id,
+        student_ids=draw_confirm.student_ids,
+        session_id=draw_confirm.session_id,
+        idempotency_key=idempotency_key,
+    )
 
 
 @app.get("/health", tags=["Health"])
@@ -227,8 +438,80 @@ def health_check():
     return {"status": "ok"}
 
 
+def _authorize_metrics_token(authorization: Optional[str] = Header(None)):
+    if not secrets.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def _metrics_gauges():
+    gauges = []
+    cache_stats = [cache.stats() for cache in CACHES]
+    for key, name, help_text in (
+        ("hits", "cache_hits_total", "Cache lookups that found a live entry."),
+        ("misses", "cache_misses_total", "Cache lookups that missed."),
+        ("size", "cache_entries", "Entries currently cached."),
+    ):
+        gauges += [(name, help_text, {"cache": stats["name"]}, stats[key]) for stats in cache_stats]
+    gauges += [
+        ("cache_hit_ratio", "Share of cache lookups that hit since startup.", {"cache": stats["name"]},
+         stats["hits"] / (stats["hits"] + stats["misses"]) if stats["hits"] + stats["misses"] else 0.0)
+        for stats in cache_stats
+    ]
+
+    pool_stats = auth.password_hash_pool.stats()
+    gauges.append(("password_hash_in_flight", "Password hashes being computed or queued.", {}, pool_stats["in_flight"]))
+    gauges.append(("password_hash_rejected_total", "Password hash requests rejected with 503.", {}, pool_stats["rejected"]))
+    gauges.append(("event_stream_subscribers", "Open classroom event streams.", {}, event_broker.subscriber_count()))
+    checked_out = getattr(engine.pool, "checkedout", None)
+    if checked_out is not None:
+        gauges.append(("db_pool_connections_checked_out", "Database connections in use.", {}, checked_out()))
+    return gauges
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Health"])
+def read_metrics(_: None = Depends(_authorize_metrics_token if METRICS_TOKEN else auth.get_current_admin_user)):
+    return PlainTextResponse(
+        metrics_registry.render(_metrics_gauges()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/profiles/{profile_id}", response_class=PlainTextResponse, tags=["Admin"])
+def read_profile(profile_id: str, current_user: models.User = Depends(auth.get_current_admin_user)):
+    report = profile_cache.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found or expired")
+    return PlainTextResponse(report)
+
+
+@app.get("/cache/stats", response_model=List[schemas.CacheStats], tags=["Admin"])
+def read_cache_stats(current_user: models.User = Depends(auth.get_current_admin_user)):
+    return [cache.stats() for cache in CACHES]
+
+
+@app.get("/password-hash-pool/stats", response_model=schemas.PasswordHashPoolStats, tags=["Admin"])
+def read_password_hash_pool_stats(current_user: models.User = Depends(auth.get_current_admin_user)):
+    return auth.password_hash_pool.stats()
+
+
 @app.get("/settings/{key}", response_model=schemas.Setting, tags=["Settings"])
-def read_setting(key: str, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+def read_setting(
+    key: str,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    cached = etags.not_modified(
+        request, response, etags.settings_etag(),
+        exists=lambda: crud.get_setting(db, key=key) is not None,
+    )
+    if cached is not None:
+        return cached
     db_setting = crud.get_setting(db, key=key)
     if db_setting is None:
         raise HTTPException(status_code=404, detail="Setting not found")
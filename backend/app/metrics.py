@@ -0,0 +1,224 @@
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 1.0))
+# Statements kept per request for the slow-request log.
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", 50))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class RequestStats:
+    """SQL activity of the current request, collected by the engine events."""
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    statements: List[Tuple[float, str]] = field(default_factory=list)
+
+    def record_query(self, statement: str, seconds: float):
+        self.sql_count += 1
+        self.sql_seconds += seconds
+        if len(self.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+            self.statements.append((seconds, statement))
+
+
+# Set per request by MetricsMiddleware; worker threads inherit it via context copying.
+current_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request_stats", default=None
+)
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.responses: Dict[int, int] = {}
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+
+
+class MetricsRegistry:
+    """Process-wide request and SQL metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def start_request(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def record_request(self, method: str, route: str, status_code: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            self.in_flight -= 1
+            metrics = self.routes.get((method, route))
+            if metrics is None:
+                metrics = self.routes[(method, route)] = RouteMetrics()
+            metrics.latency.observe(seconds)
+            metrics.responses[status_code] = metrics.responses.get(status_code, 0) + 1
+            metrics.sql_queries += stats.sql_count
+            metrics.sql_seconds += stats.sql_seconds
+
+    def record_query(self, seconds: float):
+        with self._lock:
+            self.sql_queries += 1
+            self.sql_seconds += seconds
+
+    def render(self, gauges: Iterable[Tuple[str, str, Dict[str, str], float]] = ()) -> str:
+        """`gauges` are extra (name, help, labels, value) samples read at scrape time."""
+        lines = []
+
+        def header(name: str, help_text: str, metric_type: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        with self._lock:
+            routes = sorted(self.routes.items())
+            header("http_request_duration_seconds", "Request latency by route.", "histogram")
+            for (method, route), metrics in routes:
+                labels = {"method": method, "route": route}
+                cumulative = 0
+                bounds = [_format_value(bound) for bound in metrics.latency.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, metrics.latency.counts):
+                    cumulative += count
+                    lines.append(_sample("http_request_duration_seconds_bucket", {**labels, "le": bound}, cumulative))
+                lines.append(_sample("http_request_duration_seconds_sum", labels, metrics.latency.total))
+                lines.append(_sample("http_request_duration_seconds_count", labels, cumulative))
+
+            header("http_responses_total", "Responses by route and status code.", "counter")
+            for (method, route), metrics in routes:
+                for status_code, count in sorted(metrics.responses.items()):
+                    lines.append(_sample("http_responses_total", {"method": method, "route": route, "status": str(status_code)}, count))
+
+            header("http_request_sql_queries_total", "SQL queries issued while serving each route.", "counter")
+            for (method, route), metrics in routes:
+                lines.append(_sample("http_request_sql_queries_total", {"method": method, "route": route}, metrics.sql_queries))
+            header("http_request_sql_seconds_total", "Time spent in SQL while serving each route.", "counter")
+            for (method, route), metrics in routes:
+                lines.append(_sample("http_request_sql_seconds_total", {"method": method, "route": route}, metrics.sql_seconds))
+
+            header("http_requests_in_flight", "Requests currently being served.", "gauge")
+            lines.append(_sample("http_requests_in_flight", {}, self.in_flight))
+            header("sql_queries_total", "SQL queries issued by the application.", "counter")
+            lines.append(_sample("sql_queries_total", {}, self.sql_queries))
+            header("sql_query_seconds_total", "Time spent in SQL queries.", "counter")
+            lines.append(_sample("sql_query_seconds_total", {}, self.sql_seconds))
+
+        seen = set()
+        for name, help_text, labels, value in gauges:
+            if name not in seen:
+                seen.add(name)
+                header(name, help_text, "counter" if name.endswith("_total") else "gauge")
+            lines.append(_sample(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return f"{value:.1f}"
+    return str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name: str, labels: Dict[str, str], value) -> str:
+    if labels:
+        label_text = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+        return f"{name}{{{label_text}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+registry = MetricsRegistry()
+
+
+def instrument_engine(engine: Engine):
+    """Times every statement and attributes it to the request being served, if any."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start_times"].pop()
+        registry.record_query(seconds)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.record_query(statement, seconds)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and SQL activity per route template, tracks
+    in-flight requests and logs the SQL of requests slower than
+    SLOW_REQUEST_SECONDS.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+        streaming = False
+
+        async def send_with_status(message: Message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                streaming = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+            await send(message)
+
+        registry.start_request()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            current_request_stats.reset(token)
+
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "<unmatched>"
+            registry.record_request(scope["method"], route_path, status_code, seconds, stats)
+            # Event streams are long-lived by design.
+            if seconds >= SLOW_REQUEST_SECONDS and not streaming:
+                slowest = sorted(stats.statements, reverse=True)[:5]
+                logger.warning(
+                    "Slow request %s %s: %.3fs, %d SQL queries in %.3fs%s",
+                    scope["method"], scope["path"], seconds, stats.sql_count, stats.sql_seconds,
+                    "".join(f"\n  {query_seconds:.3f}s {statement}" for query_seconds, statement in slowest),
+                )
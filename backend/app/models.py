@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON, Boolean, Table
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON, Boolean, Table, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 import datetime
 
@@ -9,7 +9,8 @@ student_group_association = Table(
     'student_group_association',
     Base.metadata,
     Column('student_id', Integer, ForeignKey('students.id', ondelete="CASCADE"), primary_key=True),
-    Column('group_id', Integer, ForeignKey('groups.id', ondelete="CASCADE"), primary_key=True)
+    Column('group_id', Integer, ForeignKey('groups.id', ondelete="CASCADE"), primary_key=True),
+    Index('ix_student_group_association_group_id', 'group_id'),
 )
 
 class Classroom(Base):
@@ -29,7 +30,10 @@ class Student(Base):
     name = Column(String, index=True)
     weight = Column(Float, default=1.0)
     draw_count = Column(Integer, default=0)
-    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"))
+    # Exponentially decayed draw count, valid as of score_updated_at.
+    decayed_score = Column(Float, default=0.0)
+    score_updated_at = Column(DateTime, nullable=True)
+    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"), index=True)
 
     classroom = relationship("Classroom", back_populates="students")
     groups = relationship(
@@ -43,7 +47,7 @@ class Group(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"))
+    classroom_id = Column(Integer, ForeignKey("classrooms.id", ondelete="CASCADE"), index=True)
 
     classroom = relationship("Classroom", back_populates="groups")
     students = relationship(
@@ -54,13 +58,29 @@ class Group(Base):
 
 class DrawingHistory(Base):
     __tablename__ = "drawing_history"
+    __table_args__ = (
+        Index("ix_drawing_history_classroom_id_drawing_date", "classroom_id", "drawing_date"),
+        UniqueConstraint("classroom_id", "idempotency_key", name="uq_drawing_history_classroom_id_idempotency_key"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"))
     drawing_date = Column(DateTime, default=datetime.datetime.utcnow)
     drawn_students = Column(JSON)
+    # Client-supplied key making confirm_draw retries idempotent, unique per classroom.
+    idempotency_key = Column(String, nullable=True)
 
     classroom = relationship("Classroom", back_populates="drawing_history")
+    entries = relationship("DrawingHistoryEntry", back_populates="drawing_history", cascade="all, delete-orphan")
+
+class DrawingHistoryEntry(Base):
+    """One row per student drawn in a DrawingHistory, for indexed per-student queries."""
+    __tablename__ = "drawing_history_entries"
+
+    history_id = Column(Integer, ForeignKey("drawing_history.id", ondelete="CASCADE"), primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+    drawing_history = relationship("DrawingHistory", back_populates="entries")
 
 class Setting(Base):
     __tablename__ = "settings"
@@ -0,0 +1,190 @@
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import secrets
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import auth
+from .cache import profile_cache
+from .database import SessionLocal
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", 40))
+
+
+class ProfileSession:
+    def __init__(self, profile_id: str, method: str, path: str):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.seconds: Optional[float] = None
+        self.busy = False
+        self.statements: List[Tuple[float, str, str]] = []
+
+    def report(self) -> str:
+        output = io.StringIO()
+        output.write(f"{self.method} {self.path}: {self.seconds:.3f}s\n")
+        output.write(f"\n{len(self.statements)} SQL statements, {sum(s[0] for s in self.statements):.3f}s:\n")
+        for seconds, statement, parameters in self.statements:
+            output.write(f"\n[{seconds * 1000:.2f} ms] {statement}\n  parameters: {parameters}\n")
+        output.write("\nEndpoint call profile:\n")
+        if self.busy:
+            output.write("  (skipped, another profile was running)\n")
+            return output.getvalue()
+        try:
+            stats = pstats.Stats(self.profiler, stream=output)
+        except TypeError:
+            # Nothing ran under the profiler, e.g. the request failed in a dependency.
+            output.write("  (empty)\n")
+        else:
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+            stats.print_callees(PROFILE_TOP_FUNCTIONS)
+        return output.getvalue()
+
+
+# Only set while an admin-requested profile is running, so the hooks below
+# cost a single context variable lookup otherwise.
+current_profile: contextvars.ContextVar[Optional[ProfileSession]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def _start_profiler(session: ProfileSession) -> bool:
+    try:
+        session.profiler.enable()
+    except ValueError:
+        # Another profile is running; on Python 3.12+ profilers are process-wide.
+        session.busy = True
+        return False
+    return True
+
+
+def profiled(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Runs the endpoint under the request's profiler when one is active.
+    The profile can include frames of concurrent requests: other coroutines on
+    the event loop, and on Python 3.12+ other threads as well.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            session = current_profile.get()
+            if session is None or not _start_profiler(session):
+                return await endpoint(*args, **kwargs)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                session.profiler.disable()
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        session = current_profile.get()
+        if session is None or not _start_profiler(session):
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            session.profiler.disable()
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+def record_profiled_statements(engine: Engine):
+    """Records the statements and parameters of profiled requests."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_start_times", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        session = current_profile.get()
+        if session is not None:
+            seconds = time.perf_counter() - conn.info["profile_start_times"].pop()
+            session.statements.append((seconds, statement, repr(parameters)[:500]))
+
+
+def _authorize_profile(authorization: Optional[str]):
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    db = SessionLocal()
+    try:
+        return auth.get_current_user(token=token, db=db)
+    finally:
+        db.close()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when an admin sends `X-Profile: 1`. The report (call
+    profile of the endpoint plus every SQL statement) is kept in
+    profile_cache and its id returned in the X-Profile-Id header.
+    Requests without the header only pay for the header lookup.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not any(
+            name == PROFILE_HEADER and value not in (b"", b"0") for name, value in scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        authorization = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"authorization"), None
+        )
+        try:
+            user = await run_in_threadpool(_authorize_profile, authorization)
+            await auth.get_current_admin_user(user)
+        except HTTPException as exc:
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            await response(scope, receive, send)
+            return
+
+        session = ProfileSession(secrets.token_urlsafe(8), scope["method"], scope["path"])
+        stored = False
+
+        def store():
+            nonlocal stored
+            if not stored:
+                stored = True
+                session.seconds = time.perf_counter() - session.started
+                profile_cache.set(session.profile_id, session.report())
+
+        async def send_with_profile_id(message: Message):
+            if message["type"] == "http.response.start":
+                store()
+                MutableHeaders(scope=message)["X-Profile-Id"] = session.profile_id
+            await send(message)
+
+        token = current_profile.set(session)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            current_profile.reset(token)
+            store()
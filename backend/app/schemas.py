@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
 
 # Forward declaration to handle circular dependencies
@@ -46,10 +46,18 @@ Group.model_rebuild()
 Student.model_rebuild()
 
 
+class RosterImportResult(BaseModel):
+    created: int
+    skipped: int
+    skipped_names: List[str] = []
+
 class StudentUpdateAdmin(BaseModel):
     name: str
     draw_count: int
 
+class StudentBatchUpdate(StudentUpdateAdmin):
+    id: int
+
 class ClassroomBase(BaseModel):
     name: str
 
@@ -64,6 +72,14 @@ class Classroom(ClassroomBase):
     class Config:
         from_attributes = True
 
+class ClassroomSummary(ClassroomBase):
+    id: int
+    student_count: int
+    group_count: int
+
+    class Config:
+        from_attributes = True
+
 class DrawCreate(BaseModel):
     num_students: int
     student_ids: Optional[List[int]] = None
@@ -72,6 +88,18 @@ class DrawCreate(BaseModel):
 class StudentIDs(BaseModel):
     student_ids: List[int]
 
+class DrawConfirm(StudentIDs):
+    student_ids: List[int] = Field(min_length=1)
+    session_id: Optional[str] = None
+
+class DrawResult(BaseModel):
+    session_id: str
+    students: List[Student]
+
+class DrawConfirmation(BaseModel):
+    drawn: List[Student]
+    students: List[Student]
+
 class SettingBase(BaseModel):
     key: str
     value: str
@@ -100,6 +128,60 @@ class DrawingHistory(DrawingHistoryBase):
             datetime: lambda dt: dt.isoformat() + "Z"
         }
 
+class StudentDrawStats(BaseModel):
+    student_id: int
+    name: str
+    draw_count: int
+    draws_week: int
+    draws_month: int
+    draws_term: int
+    draws_total: int
+    last_drawn_at: Optional[datetime] = None
+
+    class Config:
+        json_encoders = {
+            datetime: lambda dt: dt.isoformat() + "Z"
+        }
+
+class FairnessMetrics(BaseModel):
+    window: str
+    mean: float
+    variance: float
+    gini: float
+
+class ClassroomStats(BaseModel):
+    classroom_id: int
+    students: List[StudentDrawStats]
+    fairness: FairnessMetrics
+
+class SimulationCreate(BaseModel):
+    num_students: int = Field(1, ge=1)
+    num_lessons: int = Field(10, ge=1)
+    trials: int = Field(1000, ge=1)
+    student_ids: Optional[List[int]] = None
+    group_id: Optional[int] = None
+    weighting_policy: Optional[Literal["draw_count", "decay"]] = None
+    decay_half_life_days: Optional[float] = Field(None, gt=0)
+    days_between_lessons: float = Field(1.0, ge=0)
+    seed: Optional[int] = None
+
+class SimulatedStudent(BaseModel):
+    student_id: int
+    name: str
+    probability: float
+    expected_draws: float
+    expected_frequency: float
+    ci_low: float
+    ci_high: float
+
+class SimulationResult(BaseModel):
+    classroom_id: int
+    weighting_policy: str
+    num_students: int
+    num_lessons: int
+    trials: int
+    students: List[SimulatedStudent]
+
 class UserBase(BaseModel):
     username: str
 
@@ -121,6 +203,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class EventStreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
@@ -129,4 +215,18 @@ class PasswordUpdate(BaseModel):
     new_password: str
 
 class Message(BaseModel):
-    message: str
\ No newline at end of file
+    message: str
+
+class PasswordHashPoolStats(BaseModel):
+    max_workers: int
+    max_backlog: int
+    in_flight: int
+    queue_depth: int
+    rejected: int
+
+class CacheStats(BaseModel):
+    name: str
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
\ No newline at end of file
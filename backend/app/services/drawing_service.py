@@ -1,56 +1,126 @@
 from sqlalchemy.orm import Session
+import datetime
 import random
-from typing import List, Optional
+import secrets
+from collections import defaultdict
+from typing import List, NamedTuple, Optional, Tuple
 
 from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
 
-from .. import crud, models, schemas
+from .. import crud, schemas
+from ..cache import draw_session_cache, roster_cache
+from ..events import event_broker
+from . import sampling
+
+# Per-classroom settings keys, e.g. "weightingPolicy:3" = "decay".
+WEIGHTING_POLICY_SETTING = "weightingPolicy:{classroom_id}"
+DECAY_HALF_LIFE_SETTING = "decayHalfLifeDays:{classroom_id}"
+WEIGHTING_POLICIES = ("draw_count", "decay")
+DEFAULT_DECAY_HALF_LIFE_DAYS = 14.0
 
 def calculate_weight_from_draw_count(draw_count: int) -> float:
     return 1 / (draw_count + 1) ** 2
 
-def adjust_weights(students: List[models.Student]):
+def decay_score(score: float, updated_at: Optional[datetime.datetime], now: datetime.datetime, half_life_days: float) -> float:
+    """Brings a decayed draw score stored at `updated_at` forward to `now`."""
+    if not score or updated_at is None:
+        return 0.0
+    elapsed_days = max((now - updated_at).total_seconds(), 0) / 86400
+    return score * 0.5 ** (elapsed_days / half_life_days)
+
+def get_weighting_policy(db: Session, classroom_id: int) -> Tuple[str, float]:
+    """Returns the classroom's (policy, half_life_days), falling back to the lifetime draw_count policy."""
+    policy_key = WEIGHTING_POLICY_SETTING.format(classroom_id=classroom_id)
+    half_life_key = DECAY_HALF_LIFE_SETTING.format(classroom_id=classroom_id)
+    settings = crud.get_settings(db, keys=[policy_key, half_life_key])
+
+    policy = settings.get(policy_key)
+    if policy not in WEIGHTING_POLICIES:
+        policy = "draw_count"
+    try:
+        half_life_days = float(settings[half_life_key])
+    except (KeyError, ValueError):
+        half_life_days = DEFAULT_DECAY_HALF_LIFE_DAYS
+    if half_life_days <= 0:
+        half_life_days = DEFAULT_DECAY_HALF_LIFE_DAYS
+    return policy, half_life_days
+
+def _policy_weights(students, policy: str, half_life_days: float) -> List[float]:
     """
-    Adjusts the weights of students based on their draw count.
-    The more a student has been drawn, the less likely they are to be drawn again.
+    Weights used for drawing. The "decay" policy weighs recent draws more than
+    old ones by using the time-decayed score instead of the lifetime draw_count.
     """
-    for student in students:
-        student.weight = calculate_weight_from_draw_count(student.draw_count)
+    if policy != "decay":
+        return [student.weight for student in students]
+    now = datetime.datetime.utcnow()
+    return [
+        calculate_weight_from_draw_count(decay_score(student.decayed_score, student.score_updated_at, now, half_life_days))
+        for student in students
+    ]
 
 
-def _calculate_probabilities(students: List[models.Student]) -> List[models.Student]:
-    """Helper to calculate drawing probabilities for a list of students."""
-    if not students:
+def _calculate_probabilities(weights: List[float]) -> List[float]:
+    """Helper to normalize a column of weights into drawing probabilities."""
+    if not weights:
         return []
 
-    total_weight = sum(student.weight for student in students)
+    total_weight = sum(weights)
     if total_weight == 0:
         # If all weights are zero, assign uniform probability
-        prob = 1 / len(students)
-        for student in students:
-            student.probability = prob
-    else:
-        for student in students:
-            student.probability = student.weight / total_weight
-    return students
+        return [1 / len(weights)] * len(weights)
+    return [weight / total_weight for weight in weights]
 
 
-def list_students_with_probabilities(db: Session, classroom_id: int, group_id: Optional[int] = None) -> List[models.Student]:
+def list_students_with_probabilities(db: Session, classroom_id: int, group_id: Optional[int] = None) -> List[schemas.Student]:
     """
     Gets students for a classroom (or group) and calculates their drawing probability
     within that group.
+    Works on plain column rows and only builds the response objects at the end.
+    Results are cached per (classroom_id, group_id) until the classroom changes.
     """
-    students = crud.list_students_by_classroom(db, classroom_id=classroom_id, group_id=group_id)
-    return _calculate_probabilities(students)
+    cache_key = (classroom_id, group_id)
+    cached = roster_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = roster_cache.generation(classroom_id)
+
+    rows = crud.list_student_rows_by_classroom(db, classroom_id=classroom_id, group_id=group_id)
+    if not rows:
+        return []
 
+    groups_by_student = defaultdict(list)
+    for membership in crud.list_group_memberships_by_classroom(db, classroom_id=classroom_id):
+        groups_by_student[membership.student_id].append(
+            schemas.GroupInDB(id=membership.id, name=membership.name, classroom_id=membership.classroom_id)
+        )
+
+    weights = _policy_weights(rows, *get_weighting_policy(db, classroom_id))
+    probabilities = _calculate_probabilities(weights)
+    students = [
+        schemas.Student(
+            id=row.id,
+            name=row.name,
+            weight=weight,
+            draw_count=row.draw_count,
+            classroom_id=row.classroom_id,
+            probability=probability,
+            groups=groups_by_student[row.id],
+        )
+        for row, weight, probability in zip(rows, weights, probabilities)
+    ]
+    roster_cache.set_if_current(cache_key, students, generation)
+    return students
 
-def draw_students(db: Session, classroom_id: int, num_students: int, student_ids: Optional[List[int]] = None, group_id: Optional[int] = None) -> List[models.Student]:
+
+def draw_students(db: Session, classroom_id: int, num_students: int, student_ids: Optional[List[int]] = None, group_id: Optional[int] = None, seed: Optional[int] = None) -> List[schemas.Student]:
     """
     Performs a weighted random draw of students.
     Can be filtered by a group and/or a manual selection of students.
+    A seed can be given to make the draw reproducible.
     """
-    # Determine the initial pool of students
-    students_pool = crud.list_students_by_classroom(db, classroom_id=classroom_id, group_id=group_id)
+    # The cached roster already carries the policy weights
+    students_pool = list_students_with_probabilities(db, classroom_id=classroom_id, group_id=group_id)
     pool_student_ids = {s.id for s in students_pool}
 
     # If student_ids are provided, filter the pool
@@ -69,86 +139,155 @@ def draw_students(db: Session, classroom_id: int, num_students: int, student_ids
     if not students_to_draw_from:
         return []
 
-    num_to_draw = min(num_students, len(students_to_draw_from))
+    rng = random.Random(seed) if seed is not None else None
     weights = [s.weight for s in students_to_draw_from]
-    
-    # Perform weighted sample without replacement
-    drawn_students = []
-    # Create a temporary list of students and weights to modify during selection
-    temp_students = list(students_to_draw_from)
-    
-    while len(drawn_students) < num_to_draw and temp_students:
-        total_weight = sum(w for s, w in zip(temp_students, weights) if s not in drawn_students)
-
-        if total_weight == 0:
-            # If all remaining weights are zero, choose uniformly from remaining students
-            eligible = [s for s in temp_students if s not in drawn_students]
-            if not eligible:
-                break
-            chosen = random.choice(eligible)
+    return sampling.weighted_sample_without_replacement(students_to_draw_from, weights, num_students, rng=rng)
+
+
+class DrawSession(NamedTuple):
+    classroom_id: int
+    group_id: Optional[int]
+    drawn_ids: Tuple[int, ...]
+
+
+def start_draw_session(db: Session, classroom_id: int, num_students: int, student_ids: Optional[List[int]] = None, group_id: Optional[int] = None) -> schemas.DrawResult:
+    """
+    Draws students and keeps the result in a short-lived in-memory session,
+    so the confirmation does not need to reload and revalidate the pool.
+    """
+    drawn = draw_students(db, classroom_id=classroom_id, num_students=num_students, student_ids=student_ids, group_id=group_id)
+    session_id = secrets.token_urlsafe(16)
+    draw_session_cache.set(session_id, DrawSession(
+        classroom_id=classroom_id,
+        group_id=group_id,
+        drawn_ids=tuple(s.id for s in drawn),
+    ))
+    return schemas.DrawResult(session_id=session_id, students=drawn)
+
+
+def confirm_draw_session(db: Session, classroom_id: int, student_ids: List[int], session_id: Optional[str] = None, idempotency_key: Optional[str] = None) -> schemas.DrawConfirmation:
+    """
+    Confirms some or all of the students of a draw session (or a plain list of
+    students without a session) and returns them with the updated roster
+    probabilities, so clients do not need to refetch the classroom.
+    The session id doubles as the idempotency key when none is given.
+    """
+    group_id = None
+    if session_id:
+        idempotency_key = idempotency_key or session_id
+        session = draw_session_cache.get(session_id)
+        if session is None:
+            if not crud.get_drawing_history_by_idempotency_key(db, classroom_id, idempotency_key):
+                raise HTTPException(status_code=404, detail="Draw session not found or expired.")
         else:
-            # Recalculate probabilities for the remaining students
-            remaining_weights = [w if s not in drawn_students else 0 for s, w in zip(temp_students, weights)]
-            chosen = random.choices(temp_students, weights=remaining_weights, k=1)[0]
+            if session.classroom_id != classroom_id or not set(student_ids).issubset(session.drawn_ids):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="The confirmed students were not drawn in this session."
+                )
+            group_id = session.group_id
+
+    confirm_draw(db, classroom_id=classroom_id, student_ids=student_ids, idempotency_key=idempotency_key)
+    if session_id:
+        draw_session_cache.pop(session_id)
+
+    students = list_students_with_probabilities(db, classroom_id=classroom_id, group_id=group_id)
+    drawn_ids = set(student_ids)
+    drawn = [s for s in students if s.id in drawn_ids]
+    if len(drawn) != len(drawn_ids):
+        drawn = [s for s in list_students_with_probabilities(db, classroom_id=classroom_id) if s.id in drawn_ids]
+    event_broker.publish(classroom_id, "draw", {
+        "drawn_ids": student_ids,
+        "students": [{"id": s.id, "weight": s.weight, "draw_count": s.draw_count} for s in drawn],
+    })
+    return schemas.DrawConfirmation(drawn=drawn, students=students)
 
-        drawn_students.append(chosen)
-        # To prevent a student from being chosen again, we can remove them,
-        # but it's safer to just handle it in the weight calculation above.
-        # To be absolutely sure, find the index and set weight to 0 for next iteration.
-        try:
-            chosen_index = temp_students.index(chosen)
-            weights[chosen_index] = 0
-        except ValueError:
-            # Should not happen
-            break
 
-    return drawn_students
+def _is_replay(db: Session, classroom_id: int, student_ids: List[int], idempotency_key: Optional[str]) -> bool:
+    """
+    Whether the classroom already recorded a draw under this idempotency key.
+    Reusing a key for a different set of students is a conflict.
+    """
+    if not idempotency_key:
+        return False
+    history = crud.get_drawing_history_by_idempotency_key(db, classroom_id, idempotency_key)
+    if history is None:
+        return False
+    if {student["id"] for student in history.drawn_students} != set(student_ids):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This idempotency key was already used for a different draw."
+        )
+    return True
 
 
-def confirm_draw(db: Session, classroom_id: int, student_ids: List[int]) -> List[models.Student]:
+def confirm_draw(db: Session, classroom_id: int, student_ids: List[int], idempotency_key: Optional[str] = None):
     """
     Confirms a draw by updating draw counts for selected students,
     adjusting their weights, and creating a history record.
+    Counts, weights and decayed scores are incremented by a single UPDATE in
+    SQL, so concurrent confirmations never lose updates. A retried request
+    carrying the same idempotency key (scoped to the classroom) is a no-op,
+    so the draw is never counted twice.
     This is an atomic transaction.
     """
+    student_ids = list(dict.fromkeys(student_ids))
     if not student_ids:
-        return []
-        
+        return
+
+    if _is_replay(db, classroom_id, student_ids, idempotency_key):
+        return
+
+    _, half_life_days = get_weighting_policy(db, classroom_id)
     try:
-        students_to_update = crud.get_students_by_ids(db, student_ids=student_ids)
-        
-        if len(students_to_update) != len(student_ids):
+        updated = crud.increment_student_draws(
+            db, classroom_id=classroom_id, student_ids=student_ids,
+            now=datetime.datetime.utcnow(), half_life_days=half_life_days,
+        )
+        if len(updated) != len(student_ids):
             raise HTTPException(status_code=404, detail="One or more students not found.")
 
-        for student in students_to_update:
-            student.draw_count += 1
-        
-        adjust_weights(students_to_update)
-        
-        crud.create_drawing_history(db=db, classroom_id=classroom_id, drawn_students=students_to_update)
-        
+        position = {student_id: index for index, student_id in enumerate(student_ids)}
+        drawn_students = sorted(updated, key=lambda row: position[row.id])
+        crud.create_drawing_history(db=db, classroom_id=classroom_id, drawn_students=drawn_students, idempotency_key=idempotency_key)
+
         db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same idempotency key committed first.
+        db.rollback()
+        if not _is_replay(db, classroom_id, student_ids, idempotency_key):
+            raise
     except Exception as e:
         db.rollback()
         raise e
-        
-    return students_to_update
+    roster_cache.invalidate_classroom(classroom_id)
 
 
-def reset_classroom(db: Session, classroom_id: int):
+def reset_classrooms(db: Session, classroom_ids: Optional[List[int]] = None):
     """
     Resets all student weights and draw counts, and deletes the drawing history
-    for a given classroom in a single transaction.
+    of the given classrooms (all classrooms when None) with set-based
+    statements in a single transaction.
     """
     try:
-        students = crud.list_students_by_classroom(db, classroom_id=classroom_id)
-        for student in students:
-            student.weight = 1.0
-            student.draw_count = 0
-        
-        crud.delete_drawing_history_by_classroom(db, classroom_id=classroom_id)
-        
+        crud.reset_student_draws(db, classroom_ids=classroom_ids)
+        crud.delete_drawing_history_by_classrooms(db, classroom_ids=classroom_ids)
         db.commit()
     except Exception as e:
         db.rollback()
         raise e
+    if classroom_ids is None:
+        roster_cache.invalidate_all()
+        event_broker.publish(None, "reset")
+    else:
+        for classroom_id in classroom_ids:
+            roster_cache.invalidate_classroom(classroom_id)
+            event_broker.publish(classroom_id, "reset")
+
+
+def reset_classroom(db: Session, classroom_id: int):
+    """
+    Resets all student weights and draw counts, and deletes the drawing history
+    for a given classroom in a single transaction.
+    """
+    reset_classrooms(db, classroom_ids=[classroom_id])
@@ -0,0 +1,66 @@
+import csv
+from collections import defaultdict
+from typing import Collection, Iterable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+
+
+def read_roster_names(lines: Iterable[str]) -> List[Tuple[str, str]]:
+    """
+    Reads a semicolon CSV whose first column is "LAST NAMES First" and returns
+    (first_name, last_name) tuples. The header row is skipped.
+    """
+    reader = csv.reader(lines, delimiter=';')
+    next(reader, None)  # Skip header
+    students_in_class = []
+    for row in reader:
+        if not row:
+            continue
+        # Split name, handling multi-word last names
+        parts = row[0].split()
+        if len(parts) >= 2:
+            students_in_class.append((parts[-1], " ".join(parts[:-1])))
+    return students_in_class
+
+
+def build_display_names(students_in_class: List[Tuple[str, str]], existing_names: Collection[str] = ()) -> List[str]:
+    """
+    Students are shown by first name; first names shared with another row of
+    the file or with a student already in the classroom get the initial of
+    the last name appended ("Lucas M."). Returns one name per row, in file order.
+    """
+    first_name_counts = defaultdict(int)
+    for first_name, _ in students_in_class:
+        first_name_counts[first_name] += 1
+    existing_first_names = {name.split()[0] for name in existing_names if name.split()}
+
+    display_names = []
+    for first_name, last_name in students_in_class:
+        if first_name_counts[first_name] > 1 or first_name in existing_first_names:
+            display_names.append(f"{first_name} {last_name[0]}.")
+        else:
+            display_names.append(first_name)
+    return display_names
+
+
+def import_roster(db: Session, classroom_id: int, lines: Iterable[str]) -> schemas.RosterImportResult:
+    """
+    Creates the students of a roster CSV in one transaction.
+    Names already present in the classroom, or repeated in the file, are
+    skipped and reported. Last names are not stored, so a student whose first
+    name is already taken is imported as "First L." even if it is the same
+    person; re-imports only skip rows that resolve to an existing name.
+    """
+    existing_names = crud.list_student_names_by_classroom(db, classroom_id=classroom_id)
+    new_names, skipped_names = [], []
+    seen = set(existing_names)
+    for name in build_display_names(read_roster_names(lines), existing_names):
+        if name in seen:
+            skipped_names.append(name)
+        else:
+            seen.add(name)
+            new_names.append(name)
+    crud.bulk_create_students(db, names=new_names, classroom_id=classroom_id)
+    return schemas.RosterImportResult(created=len(new_names), skipped=len(skipped_names), skipped_names=skipped_names)
@@ -0,0 +1,42 @@
+import heapq
+import math
+import random
+from typing import List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+def weighted_sample_without_replacement(
+    items: Sequence[T],
+    weights: Sequence[float],
+    k: int,
+    rng: Optional[random.Random] = None,
+) -> List[T]:
+    """
+    Draws k items without replacement, each round picking an item with
+    probability proportional to its weight among the remaining items.
+
+    Uses Efraimidis-Spirakis keyed sampling: every item gets the key
+    log(u) / weight and the k largest keys win, which is O(n + k log n)
+    instead of recomputing the remaining total weight on every round.
+    Items with a zero weight are only drawn once every positive-weight item
+    has been drawn, and then uniformly among themselves.
+    """
+    if len(items) != len(weights):
+        raise ValueError("items and weights must have the same length")
+
+    k = min(k, len(items))
+    if k <= 0:
+        return []
+
+    rng = rng or random.Random()
+    heap = []
+    for index, weight in enumerate(weights):
+        if weight > 0:
+            key = math.log(1.0 - rng.random()) / weight
+        else:
+            key = -math.inf
+        heap.append((-key, rng.random(), index))
+    heapq.heapify(heap)
+
+    return [items[heapq.heappop(heap)[2]] for _ in range(k)]
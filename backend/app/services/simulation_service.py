@@ -0,0 +1,182 @@
+import bisect
+import datetime
+import itertools
+import math
+import os
+import random
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+from .drawing_service import (
+    _calculate_probabilities,
+    _policy_weights,
+    calculate_weight_from_draw_count,
+    decay_score,
+    get_weighting_policy,
+)
+
+# Upper bounds per request: trials * lessons, and the sampling cost
+# trials * lessons * students drawn per lesson * roster size.
+SIMULATION_MAX_ROUNDS = int(os.getenv("SIMULATION_MAX_ROUNDS", 100_000))
+SIMULATION_MAX_COST = int(os.getenv("SIMULATION_MAX_COST", 20_000_000))
+Z_95 = 1.959963984540054
+
+
+def _draw_indices(weights: List[float], k: int, rng: random.Random) -> List[int]:
+    """
+    Draws k distinct indices, each round proportionally to the remaining
+    weights. Like sampling.weighted_sample_without_replacement, zero-weight
+    indices are only drawn once every positive weight has been, and then
+    uniformly among themselves.
+    Cumulative sums and bisection run in C, which keeps lessons cheap for large rosters.
+    """
+    n = len(weights)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    if k == 1:
+        cumulative = list(itertools.accumulate(weights))
+        if cumulative[-1] <= 0:
+            return [rng.randrange(n)]
+        return [min(bisect.bisect(cumulative, rng.random() * cumulative[-1]), n - 1)]
+    remaining = list(weights)
+    picked = []
+    for _ in range(k):
+        cumulative = list(itertools.accumulate(remaining))
+        if cumulative[-1] <= 0:
+            break
+        index = min(bisect.bisect(cumulative, rng.random() * cumulative[-1]), n - 1)
+        picked.append(index)
+        remaining[index] = 0.0
+    if len(picked) < k:
+        taken = set(picked)
+        picked.extend(rng.sample([index for index in range(n) if index not in taken], k - len(picked)))
+    return picked
+
+
+def run_simulation(
+    scores: List[float],
+    num_students: int,
+    num_lessons: int,
+    trials: int,
+    initial_weights: Optional[List[float]] = None,
+    decay_per_lesson: Optional[float] = None,
+    rng: Optional[random.Random] = None,
+) -> Tuple[List[float], List[float]]:
+    """
+    Monte-Carlo engine: replays `trials` independent runs of `num_lessons`
+    draw + confirm cycles starting from the given scores (draw counts, or
+    decayed scores when `decay_per_lesson` is set) and returns, per student,
+    the sum and the sum of squares of the number of draws per run.
+    `initial_weights` lets the first lesson use the stored student weights.
+    Only the weights of the drawn students are recomputed after a lesson,
+    unless decay changes every score.
+    """
+    rng = rng or random.Random()
+    n = len(scores)
+    sums = [0.0] * n
+    sums_sq = [0.0] * n
+
+    for _ in range(trials):
+        run_scores = list(scores)
+        if initial_weights is not None:
+            weights = list(initial_weights)
+        else:
+            weights = [calculate_weight_from_draw_count(score) for score in run_scores]
+        drawn = [0] * n
+        for _ in range(num_lessons):
+            for index in _draw_indices(weights, num_students, rng):
+                run_scores[index] += 1
+                weights[index] = calculate_weight_from_draw_count(run_scores[index])
+                drawn[index] += 1
+            if decay_per_lesson is not None:
+                run_scores = [score * decay_per_lesson for score in run_scores]
+                weights = [calculate_weight_from_draw_count(score) for score in run_scores]
+        for index, count in enumerate(drawn):
+            if count:
+                sums[index] += count
+                sums_sq[index] += count * count
+
+    return sums, sums_sq
+
+
+def simulate_draws(db: Session, classroom_id: int, params: schemas.SimulationCreate) -> schemas.SimulationResult:
+    """
+    Previews the expected draw distribution over the next lessons.
+    The roster is read once; the simulation itself runs in memory and never
+    writes to the database.
+    """
+    if params.num_lessons * params.trials > SIMULATION_MAX_ROUNDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"num_lessons * trials must not exceed {SIMULATION_MAX_ROUNDS}."
+        )
+
+    if not crud.classroom_exists(db, classroom_id=classroom_id):
+        raise HTTPException(status_code=404, detail="Classroom not found")
+
+    policy, half_life_days = get_weighting_policy(db, classroom_id)
+    policy = params.weighting_policy or policy
+    half_life_days = params.decay_half_life_days or half_life_days
+
+    rows = crud.list_student_rows_by_classroom(db, classroom_id=classroom_id, group_id=params.group_id)
+    if params.student_ids:
+        if not set(params.student_ids).issubset(row.id for row in rows):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="One or more selected students do not belong to the selected subgroup or classroom."
+            )
+        selected = set(params.student_ids)
+        rows = [row for row in rows if row.id in selected]
+
+    rounds = params.num_lessons * params.trials
+    if rounds * min(params.num_students, len(rows)) * len(rows) > SIMULATION_MAX_COST:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"num_lessons * trials * num_students * roster size must not exceed {SIMULATION_MAX_COST}."
+        )
+
+    if policy == "decay":
+        now = datetime.datetime.utcnow()
+        scores = [decay_score(row.decayed_score, row.score_updated_at, now, half_life_days) for row in rows]
+        decay_per_lesson = 0.5 ** (params.days_between_lessons / half_life_days)
+    else:
+        scores = [float(row.draw_count or 0) for row in rows]
+        decay_per_lesson = None
+
+    weights = _policy_weights(rows, policy, half_life_days)
+    rng = random.Random(params.seed) if params.seed is not None else None
+    sums, sums_sq = run_simulation(
+        scores, params.num_students, params.num_lessons, params.trials,
+        initial_weights=weights, decay_per_lesson=decay_per_lesson, rng=rng,
+    )
+
+    probabilities = _calculate_probabilities(weights)
+    students = []
+    for row, probability, total, total_sq in zip(rows, probabilities, sums, sums_sq):
+        mean = total / params.trials
+        variance = max(total_sq / params.trials - mean * mean, 0.0)
+        if params.trials > 1:
+            variance *= params.trials / (params.trials - 1)
+        margin = Z_95 * math.sqrt(variance / params.trials)
+        students.append(schemas.SimulatedStudent(
+            student_id=row.id,
+            name=row.name,
+            probability=probability,
+            expected_draws=mean,
+            expected_frequency=mean / params.num_lessons,
+            ci_low=max(mean - margin, 0.0),
+            ci_high=mean + margin,
+        ))
+
+    return schemas.SimulationResult(
+        classroom_id=classroom_id,
+        weighting_policy=policy,
+        num_students=params.num_students,
+        num_lessons=params.num_lessons,
+        trials=params.trials,
+        students=students,
+    )
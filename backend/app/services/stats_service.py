@@ -0,0 +1,52 @@
+import datetime
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+
+WINDOW_DAYS = {"week": 7, "month": 30, "term": 90}
+
+
+def _gini(values: List[int]) -> float:
+    """Gini coefficient of the draw counts: 0 when everyone is drawn equally often."""
+    total = sum(values)
+    if not values or total == 0:
+        return 0.0
+    n = len(values)
+    weighted_sum = sum(rank * value for rank, value in enumerate(sorted(values), start=1))
+    return (2 * weighted_sum) / (n * total) - (n + 1) / n
+
+
+def get_classroom_stats(db: Session, classroom_id: int, window: str = "term") -> schemas.ClassroomStats:
+    """
+    Per-student draw counts over the week/month/term windows, last drawn time,
+    and fairness metrics for the requested window ("all" for the whole history).
+    Counting happens in SQL; only one aggregated row per student reaches Python.
+    """
+    now = datetime.datetime.utcnow()
+    window_starts = {name: now - datetime.timedelta(days=days) for name, days in WINDOW_DAYS.items()}
+    rows = crud.get_student_draw_stats(db, classroom_id=classroom_id, window_starts=window_starts)
+
+    students = [
+        schemas.StudentDrawStats(
+            student_id=row.id,
+            name=row.name,
+            draw_count=row.draw_count or 0,
+            draws_week=row.week,
+            draws_month=row.month,
+            draws_term=row.term,
+            draws_total=row.total,
+            last_drawn_at=row.last_drawn_at,
+        )
+        for row in rows
+    ]
+
+    counts = [row.total if window == "all" else getattr(row, window) for row in rows]
+    mean = sum(counts) / len(counts) if counts else 0.0
+    variance = sum((count - mean) ** 2 for count in counts) / len(counts) if counts else 0.0
+    return schemas.ClassroomStats(
+        classroom_id=classroom_id,
+        students=students,
+        fairness=schemas.FairnessMetrics(window=window, mean=mean, variance=variance, gini=_gini(counts)),
+    )
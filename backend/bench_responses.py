@@ -0,0 +1,106 @@
+"""
+Measures payload size and latency of GET /classrooms/ at 10, 100 and 1,000
+classrooms, for each response encoding, and compares the time spent
+rendering the payload with the standard json module and with orjson.
+
+    python bench_responses.py --students 30 --groups 3 --requests 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+TMP_DIR = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR.name, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import auth, crud, models, schemas  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def seed(first: int, last: int, students: int, groups: int):
+    with SessionLocal() as db:
+        for classroom_index in range(first, last):
+            classroom = models.Classroom(name=f"Classe {classroom_index}")
+            db.add(classroom)
+            db.flush()
+            db.execute(insert(models.Student), [
+                {"name": f"Eleve {i}", "classroom_id": classroom.id, "weight": 1.0, "draw_count": 0, "decayed_score": 0.0}
+                for i in range(students)
+            ])
+            student_ids = db.scalars(select(models.Student.id).where(models.Student.classroom_id == classroom.id)).all()
+            for group_index in range(groups):
+                group = models.Group(name=f"Groupe {group_index}", classroom_id=classroom.id)
+                db.add(group)
+                db.flush()
+                db.execute(insert(models.student_group_association), [
+                    {"student_id": student_id, "group_id": group.id}
+                    for student_id in student_ids[group_index::groups]
+                ])
+        db.commit()
+
+
+def measure(client: TestClient, headers: dict, classrooms: int, encoding: str, requests: int):
+    timings = []
+    size = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(
+            "/classrooms/", params={"limit": classrooms}, headers={**headers, "Accept-Encoding": encoding}
+        )
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+        size = len(response.content) if encoding == "identity" else int(response.headers.get("content-length", 0))
+    return size, statistics.median(timings)
+
+
+def measure_render(payload, response_class, requests: int) -> float:
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response_class(payload)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--groups", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        crud.create_user(db, schemas.UserCreate(username="bench", password="bench"), auth.get_password_hash("bench"))
+
+    with TestClient(app) as client:
+        token = client.post("/token", data={"username": "bench", "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        seeded = 0
+        for classrooms in sorted(args.sizes):
+            seed(seeded, classrooms, args.students, args.groups)
+            seeded = classrooms
+
+            results = {encoding: measure(client, headers, classrooms, encoding, args.requests) for encoding in ENCODINGS}
+            payload = client.get("/classrooms/", params={"limit": classrooms}, headers=headers).json()
+            json_render = measure_render(payload, JSONResponse, args.requests)
+            orjson_render = measure_render(payload, ORJSONResponse, args.requests)
+
+            print(f"{classrooms:>5} classrooms")
+            for encoding, (size, latency) in results.items():
+                print(f"    {encoding:>8}: {size / 1024:>9.1f} KiB  {latency * 1000:>8.1f} ms")
+            print(f"    render: json {json_render * 1000:.2f} ms, orjson {orjson_render * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measures read/write throughput of the SQLite database under concurrent clients,
+with the default SQLite settings and with the tuned profile from app.database.
+
+    python bench_sqlite.py --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base, SQLITE_PRAGMAS, build_engine
+
+DEFAULT_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def seed(session_factory, classrooms: int, students_per_classroom: int):
+    with session_factory() as db:
+        for classroom_index in range(classrooms):
+            classroom = models.Classroom(name=f"Classe {classroom_index}")
+            classroom.students = [models.Student(name=f"Eleve {i}") for i in range(students_per_classroom)]
+            db.add(classroom)
+        db.commit()
+
+
+def run(pragmas, args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = build_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}", pragmas=pragmas)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        seed(session_factory, args.classrooms, args.students)
+
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.seconds
+
+        def reader(worker: int):
+            done = 0
+            with session_factory() as db:
+                while time.perf_counter() < deadline:
+                    classroom_id = (worker + done) % args.classrooms + 1
+                    db.query(models.Student).filter(models.Student.classroom_id == classroom_id).all()
+                    db.rollback()
+                    done += 1
+            with lock:
+                counts["reads"] += done
+
+        def writer(worker: int):
+            done = errors = 0
+            with session_factory() as db:
+                while time.perf_counter() < deadline:
+                    classroom_id = (worker + done) % args.classrooms + 1
+                    try:
+                        db.execute(
+                            update(models.Student)
+                            .where(models.Student.classroom_id == classroom_id)
+                            .values(draw_count=models.Student.draw_count + 1)
+                        )
+                        db.commit()
+                        done += 1
+                    except Exception:
+                        db.rollback()
+                        errors += 1
+            with lock:
+                counts["writes"] += done
+                counts["errors"] += errors
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        return {key: value / args.seconds if key != "errors" else value for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--classrooms", type=int, default=20)
+    parser.add_argument("--students", type=int, default=30)
+    args = parser.parse_args()
+
+    for label, pragmas in (("default", DEFAULT_PRAGMAS), ("tuned", SQLITE_PRAGMAS)):
+        result = run(pragmas, args)
+        print(
+            f"{label:>8}: {result['reads']:>9.0f} reads/s  {result['writes']:>8.0f} writes/s  "
+            f"{result['errors']:>4} failed writes"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+# The app builds its engine at import time, so point it at a scratch database first.
+_TMP_DIR = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR.name, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, insert, select  # noqa: E402
+
+from app import auth, crud, models, schemas  # noqa: E402
+from app.cache import CACHES  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    with engine.begin() as connection:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    for cache in CACHES:
+        cache.clear()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers(client, db):
+    crud.create_user(db, schemas.UserCreate(username="admin", password="admin", is_admin=True), auth.get_password_hash("admin"))
+    token = client.post("/token", data={"username": "admin", "password": "admin"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@contextmanager
+def capture_statements():
+    """Collects the (statement, parameters) pairs executed on the engine inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def seed_classroom(db, name: str = "Classe", students: int = 10, groups: int = 0) -> int:
+    """Creates a classroom with students spread round-robin over groups and returns its id."""
+    classroom = models.Classroom(name=name)
+    db.add(classroom)
+    db.flush()
+    if students:
+        db.execute(insert(models.Student), [
+            {"name": f"Eleve {i}", "classroom_id": classroom.id, "weight": 1.0, "draw_count": 0, "decayed_score": 0.0}
+            for i in range(students)
+        ])
+    student_ids = db.scalars(select(models.Student.id).where(models.Student.classroom_id == classroom.id)).all()
+    for group_index in range(groups):
+        group = models.Group(name=f"Groupe {group_index}", classroom_id=classroom.id)
+        db.add(group)
+        db.flush()
+        if student_ids[group_index::groups]:
+            db.execute(insert(models.student_group_association), [
+                {"student_id": student_id, "group_id": group.id} for student_id in student_ids[group_index::groups]
+            ])
+    db.commit()
+    return classroom.id
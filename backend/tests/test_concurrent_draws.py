@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import crud, models
+from app.database import SessionLocal
+from app.services import drawing_service
+from conftest import seed_classroom
+
+THREADS = 8
+
+
+def run_concurrently(task, count: int = THREADS):
+    """Runs `task(index)` in `count` threads released together, each with its own session."""
+    barrier = threading.Barrier(count)
+
+    def worker(index):
+        db = SessionLocal()
+        try:
+            barrier.wait()
+            task(db, index)
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        for future in [executor.submit(worker, index) for index in range(count)]:
+            future.result()
+
+
+def test_concurrent_confirmations_do_not_lose_updates(db):
+    classroom_id = seed_classroom(db, students=3)
+    student_id = crud.list_student_rows_by_classroom(db, classroom_id=classroom_id)[0].id
+
+    def confirm_ten_times(session, _):
+        for _ in range(10):
+            drawing_service.confirm_draw(session, classroom_id=classroom_id, student_ids=[student_id])
+
+    run_concurrently(confirm_ten_times)
+
+    db.expire_all()
+    student = db.get(models.Student, student_id)
+    assert student.draw_count == THREADS * 10
+    assert student.weight == drawing_service.calculate_weight_from_draw_count(THREADS * 10)
+    assert len(crud.get_drawing_history_by_classroom(db, classroom_id=classroom_id)) == THREADS * 10
+
+
+def test_concurrent_retries_with_the_same_key_count_once(db):
+    classroom_id = seed_classroom(db, students=3)
+    student_ids = [row.id for row in crud.list_student_rows_by_classroom(db, classroom_id=classroom_id)[:2]]
+
+    def confirm(session, _):
+        drawing_service.confirm_draw(session, classroom_id=classroom_id, student_ids=student_ids, idempotency_key="retry-1")
+
+    run_concurrently(confirm)
+
+    db.expire_all()
+    assert [db.get(models.Student, student_id).draw_count for student_id in student_ids] == [1, 1]
+    assert len(crud.get_drawing_history_by_classroom(db, classroom_id=classroom_id)) == 1
+
+
+def test_confirm_draw_endpoint_is_idempotent(client, admin_headers, db):
+    classroom_id = seed_classroom(db, students=3)
+    student_id = crud.list_student_rows_by_classroom(db, classroom_id=classroom_id)[0].id
+    headers = {**admin_headers, "Idempotency-Key": "lesson-1"}
+
+    for _ in range(3):
+        response = client.post(f"/classrooms/{classroom_id}/confirm_draw", json={"student_ids": [student_id]}, headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["drawn"][0]["draw_count"] == 1
+
+
+def test_idempotency_keys_are_scoped_to_the_classroom(client, admin_headers, db):
+    first_classroom = seed_classroom(db, name="A", students=2)
+    second_classroom = seed_classroom(db, name="B", students=2)
+    headers = {**admin_headers, "Idempotency-Key": "lesson-1"}
+
+    for classroom_id in (first_classroom, second_classroom):
+        student_id = crud.list_student_rows_by_classroom(db, classroom_id=classroom_id)[0].id
+        response = client.post(f"/classrooms/{classroom_id}/confirm_draw", json={"student_ids": [student_id]}, headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["drawn"][0]["draw_count"] == 1
+        assert len(crud.get_drawing_history_by_classroom(db, classroom_id=classroom_id)) == 1
+
+
+def test_reusing_a_key_for_other_students_conflicts(client, admin_headers, db):
+    classroom_id = seed_classroom(db, students=2)
+    first, second = [row.id for row in crud.list_student_rows_by_classroom(db, classroom_id=classroom_id)]
+    headers = {**admin_headers, "Idempotency-Key": "lesson-1"}
+
+    assert client.post(f"/classrooms/{classroom_id}/confirm_draw", json={"student_ids": [first]}, headers=headers).status_code == 200
+    response = client.post(f"/classrooms/{classroom_id}/confirm_draw", json={"student_ids": [second]}, headers=headers)
+
+    assert response.status_code == 409
+    db.expire_all()
+    assert db.get(models.Student, second).draw_count == 0
+
+
+def test_empty_confirmation_keeps_the_draw_session(client, admin_headers, db):
+    classroom_id = seed_classroom(db, students=3)
+    draw = client.post(f"/classrooms/{classroom_id}/draw", json={"num_students": 1}, headers=admin_headers).json()
+
+    empty = client.post(
+        f"/classrooms/{classroom_id}/confirm_draw", json={"student_ids": [], "session_id": draw["session_id"]}, headers=admin_headers
+    )
+    assert empty.status_code == 422
+
+    response = client.post(
+        f"/classrooms/{classroom_id}/confirm_draw",
+        json={"student_ids": [draw["students"][0]["id"]], "session_id": draw["session_id"]},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["drawn"][0]["draw_count"] == 1
@@ -0,0 +1,34 @@
+import pytest
+
+from conftest import seed_classroom
+
+
+@pytest.fixture
+def classroom_url(db):
+    # Large enough to be compressed.
+    return f"/classrooms/{seed_classroom(db, students=60, groups=2)}"
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+def test_compressed_responses_have_their_own_strong_etag(client, admin_headers, classroom_url, encoding):
+    identity = client.get(classroom_url, headers={**admin_headers, "Accept-Encoding": "identity"})
+    compressed = client.get(classroom_url, headers={**admin_headers, "Accept-Encoding": encoding})
+
+    assert compressed.headers["content-encoding"] == encoding
+    assert "content-encoding" not in identity.headers
+    assert compressed.headers["etag"] == identity.headers["etag"][:-1] + f'-{encoding}"'
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip", "identity"])
+def test_conditional_requests_match_every_content_coding(client, admin_headers, classroom_url, encoding):
+    etag = client.get(classroom_url, headers={**admin_headers, "Accept-Encoding": encoding}).headers["etag"]
+
+    response = client.get(classroom_url, headers={**admin_headers, "Accept-Encoding": encoding, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_wildcard_only_matches_existing_classrooms(client, admin_headers, classroom_url):
+    assert client.get(classroom_url, headers={**admin_headers, "If-None-Match": "*"}).status_code == 304
+    assert client.get("/classrooms/999999", headers={**admin_headers, "If-None-Match": "*"}).status_code == 404
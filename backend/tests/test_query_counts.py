@@ -0,0 +1,47 @@
+import math
+
+import pytest
+
+from conftest import capture_statements, seed_classroom
+
+# One SELECT per level of the response: classrooms, their students, the
+# students' groups, the groups, the groups' students and those students' groups.
+LIST_CLASSROOMS_STATEMENTS = 6
+# selectinload fetches related rows with IN clauses of at most 500 parent ids.
+SELECTIN_BATCH_SIZE = 500
+
+
+def list_classrooms_statements(client, headers):
+    # The first request also resolves the token; only count a warm request.
+    client.get("/classrooms/", headers=headers).raise_for_status()
+    with capture_statements() as statements:
+        response = client.get("/classrooms/", headers=headers)
+    response.raise_for_status()
+    return statements, response.json()
+
+
+@pytest.mark.parametrize("students_per_classroom", [5, 30, 100])
+def test_list_classrooms_statements_do_not_grow_with_rosters(client, admin_headers, db, students_per_classroom):
+    for index in range(10):
+        seed_classroom(db, name=f"Classe {index}", students=students_per_classroom, groups=3)
+
+    statements, classrooms = list_classrooms_statements(client, admin_headers)
+
+    total_students = 10 * students_per_classroom
+    # Two levels load groups per student, each batched separately.
+    extra_batches = 2 * (math.ceil(total_students / SELECTIN_BATCH_SIZE) - 1)
+    assert len(statements) == LIST_CLASSROOMS_STATEMENTS + extra_batches
+    assert len(classrooms) == 10
+    assert all(len(classroom["students"]) == students_per_classroom for classroom in classrooms)
+    assert all(len(classroom["groups"]) == 3 for classroom in classrooms)
+
+
+@pytest.mark.parametrize("classrooms", [1, 20, 100])
+def test_list_classrooms_statements_do_not_grow_with_classrooms(client, admin_headers, db, classrooms):
+    for index in range(classrooms):
+        seed_classroom(db, name=f"Classe {index}", students=4, groups=2)
+
+    statements, payload = list_classrooms_statements(client, admin_headers)
+
+    assert len(statements) == LIST_CLASSROOMS_STATEMENTS
+    assert len(payload) == classrooms
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+
+from app import crud
+from app.database import engine
+from app.services import drawing_service
+from conftest import capture_statements, seed_classroom
+
+
+def query_plans(captured, keyword: str):
+    """EXPLAIN QUERY PLAN details of the captured statements starting with `keyword`."""
+    plans = []
+    with engine.connect() as connection:
+        for statement, parameters in captured:
+            if statement.lstrip().upper().startswith(keyword):
+                rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).all()
+                plans.append([row[-1] for row in rows])
+    assert plans, f"no {keyword} statement was captured"
+    return plans
+
+
+@pytest.fixture
+def classroom_id(db):
+    seed_classroom(db, name="Autre", students=20, groups=2)
+    classroom_id = seed_classroom(db, name="Classe", students=20, groups=2)
+    for _ in range(5):
+        drawing_service.confirm_draw(db, classroom_id=classroom_id, student_ids=[
+            row.id for row in crud.list_student_rows_by_classroom(db, classroom_id=classroom_id)[:2]
+        ])
+    return classroom_id
+
+
+def test_roster_uses_classroom_index(db, classroom_id):
+    with capture_statements() as captured:
+        crud.list_student_rows_by_classroom(db, classroom_id=classroom_id)
+
+    for plan in query_plans(captured, "SELECT"):
+        assert any(detail.startswith("SEARCH students USING INDEX ix_students_classroom_id") for detail in plan), plan
+
+
+def test_group_filtered_roster_only_searches_indexes(db, classroom_id):
+    group_id = crud.list_groups_by_classroom(db, classroom_id=classroom_id)[0].id
+    with capture_statements() as captured:
+        crud.list_student_rows_by_classroom(db, classroom_id=classroom_id, group_id=group_id)
+
+    for plan in query_plans(captured, "SELECT"):
+        # SQLite either walks the classroom's students and probes the membership
+        # primary key, or starts from the group's memberships; never a scan.
+        assert all(detail.startswith("SEARCH") for detail in plan), plan
+        assert any(
+            "INDEX ix_students_classroom_id" in detail or "INDEX ix_student_group_association_group_id" in detail
+            for detail in plan
+        ), plan
+
+
+def test_history_page_uses_classroom_date_index(db, classroom_id):
+    newest = crud.get_drawing_history_by_classroom(db, classroom_id=classroom_id, limit=1)[0]
+    with capture_statements() as captured:
+        crud.get_drawing_history_by_classroom(
+            db, classroom_id=classroom_id, limit=2,
+            before=(newest.drawing_date, newest.id), since=datetime(2000, 1, 1),
+        )
+
+    for plan in query_plans(captured, "SELECT"):
+        assert any(
+            detail.startswith("SEARCH drawing_history USING INDEX ix_drawing_history_classroom_id_drawing_date")
+            for detail in plan
+        ), plan
+        # Rows come out of the index in order, without a sort step.
+        assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+def test_history_delete_uses_classroom_date_index(db, classroom_id):
+    with capture_statements() as captured:
+        crud.delete_drawing_history_by_classrooms(db, classroom_ids=[classroom_id])
+    db.rollback()
+
+    for plan in query_plans(captured, "DELETE"):
+        assert any(
+            detail.startswith("SEARCH drawing_history USING")
+            and "INDEX ix_drawing_history_classroom_id_drawing_date" in detail
+            for detail in plan
+        ), plan
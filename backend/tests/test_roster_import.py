@@ -0,0 +1,41 @@
+from app import crud, schemas
+from app.services import roster_import
+from conftest import seed_classroom
+
+
+def roster(*rows):
+    return ["Nom;Classe", *(f"{row};6A" for row in rows)]
+
+
+def student_names(db, classroom_id):
+    return sorted(crud.list_student_names_by_classroom(db, classroom_id=classroom_id))
+
+
+def test_duplicate_first_names_in_the_file_get_an_initial(db):
+    classroom_id = seed_classroom(db, students=0)
+
+    result = roster_import.import_roster(db, classroom_id, roster("MARTIN Lucas", "DURAND Lucas", "PETIT Emma"))
+
+    assert result == schemas.RosterImportResult(created=3, skipped=0, skipped_names=[])
+    assert student_names(db, classroom_id) == ["Emma", "Lucas D.", "Lucas M."]
+
+
+def test_first_names_already_in_the_classroom_get_an_initial(db):
+    classroom_id = seed_classroom(db, students=0)
+    crud.bulk_create_students(db, names=["Lucas"], classroom_id=classroom_id)
+
+    result = roster_import.import_roster(db, classroom_id, roster("MARTIN Lucas"))
+
+    assert result.created == 1
+    assert student_names(db, classroom_id) == ["Lucas", "Lucas M."]
+
+
+def test_existing_and_repeated_names_are_reported_as_skipped(db):
+    classroom_id = seed_classroom(db, students=0)
+    crud.bulk_create_students(db, names=["Lucas M."], classroom_id=classroom_id)
+
+    result = roster_import.import_roster(db, classroom_id, roster("MARTIN Lucas", "PETIT Emma", "PETIT Emma"))
+
+    assert result.created == 1
+    assert result.skipped == 2
+    assert result.skipped_names == ["Lucas M.", "Emma P."]
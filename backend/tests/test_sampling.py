@@ -0,0 +1,97 @@
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+from app.services.sampling import weighted_sample_without_replacement
+
+TRIALS = 20000
+# About five standard deviations of an empirical frequency over TRIALS draws.
+TOLERANCE = 0.02
+
+
+def legacy_draw(items, weights, k, rng):
+    """The round-by-round loop draw_students used before the keyed sampler."""
+    weights = list(weights)
+    drawn = []
+    while len(drawn) < min(k, len(items)):
+        total_weight = sum(w for s, w in zip(items, weights) if s not in drawn)
+        if total_weight == 0:
+            chosen = rng.choice([s for s in items if s not in drawn])
+        else:
+            remaining_weights = [w if s not in drawn else 0 for s, w in zip(items, weights)]
+            chosen = rng.choices(items, weights=remaining_weights, k=1)[0]
+        drawn.append(chosen)
+        weights[items.index(chosen)] = 0
+    return drawn
+
+
+def exact_ordered_distribution(weights, k):
+    """Probability of every ordered draw, picking proportionally (uniformly once only zero weights remain)."""
+    distribution = {}
+    for sequence in itertools.permutations(range(len(weights)), k):
+        probability = 1.0
+        remaining = set(range(len(weights)))
+        for index in sequence:
+            total = sum(weights[i] for i in remaining)
+            probability *= weights[index] / total if total > 0 else 1 / len(remaining)
+            remaining.remove(index)
+        if probability:
+            distribution[sequence] = probability
+    return distribution
+
+
+def empirical_ordered_distribution(sampler, weights, k, seed):
+    rng = random.Random(seed)
+    items = list(range(len(weights)))
+    counts = Counter(tuple(sampler(items, weights, k, rng)) for _ in range(TRIALS))
+    return {sequence: count / TRIALS for sequence, count in counts.items()}
+
+
+def keyed_sampler(items, weights, k, rng):
+    return weighted_sample_without_replacement(items, weights, k, rng=rng)
+
+
+@pytest.mark.parametrize("weights, k", [
+    ([1.0, 0.25, 0.111, 0.0625], 1),
+    ([1.0, 0.25, 0.111, 0.0625], 2),
+    ([1.0, 1.0, 0.25, 0.04], 3),
+    ([0.5, 2.0, 0.0, 0.0], 3),
+    ([0.0, 0.0, 0.0], 1),
+    ([0.0, 0.0, 0.0], 2),
+])
+def test_matches_exact_distribution_and_legacy_loop(weights, k):
+    exact = exact_ordered_distribution(weights, k)
+    keyed = empirical_ordered_distribution(keyed_sampler, weights, k, seed=1)
+    legacy = empirical_ordered_distribution(legacy_draw, weights, k, seed=2)
+
+    assert set(keyed) <= set(exact)
+    for sequence, probability in exact.items():
+        assert keyed.get(sequence, 0.0) == pytest.approx(probability, abs=TOLERANCE)
+        assert legacy.get(sequence, 0.0) == pytest.approx(probability, abs=TOLERANCE)
+
+
+def test_zero_weights_are_drawn_last():
+    rng = random.Random(3)
+    for _ in range(1000):
+        drawn = weighted_sample_without_replacement("abcd", [0.0, 1.0, 0.0, 0.5], 3, rng=rng)
+        assert set(drawn[:2]) == {"b", "d"}
+        assert drawn[2] in "ac"
+
+
+def test_seed_makes_draws_reproducible():
+    weights = [1.0, 0.25, 0.111, 0.0625, 0.04]
+    first = weighted_sample_without_replacement(range(5), weights, 3, rng=random.Random(42))
+    second = weighted_sample_without_replacement(range(5), weights, 3, rng=random.Random(42))
+    assert first == second
+
+
+def test_k_is_clamped_to_the_number_of_items():
+    assert sorted(weighted_sample_without_replacement("abc", [1.0, 0.0, 2.0], 10)) == ["a", "b", "c"]
+    assert weighted_sample_without_replacement("abc", [1.0, 1.0, 1.0], 0) == []
+
+
+def test_rejects_mismatched_weights():
+    with pytest.raises(ValueError):
+        weighted_sample_without_replacement("abc", [1.0, 1.0], 1)
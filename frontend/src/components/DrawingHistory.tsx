@@ -24,17 +24,33 @@ const formatToNearestMinute = (dateString: string) => {
 export const DrawingHistory = ({ classroomId, refreshTrigger }: DrawingHistoryProps) => {
   const [history, setHistory] = useState<DrawingHistory[]>([]);
   const [isExpanded, setIsExpanded] = useState(false);
+  // The endpoint returns one page at a time; X-Next-Cursor points to the next one.
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   useEffect(() => {
     if (classroomId) {
       api.get(`/classrooms/${classroomId}/drawing-history`)
         .then((res) => {
           setHistory(res.data);
+          setNextCursor(res.headers['x-next-cursor'] ?? null);
         })
         .catch(error => console.error("Error fetching history:", error));
     }
   }, [classroomId, refreshTrigger]);
 
+  const loadMore = () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    api.get(`/classrooms/${classroomId}/drawing-history`, { params: { cursor: nextCursor } })
+      .then((res) => {
+        setHistory(prev => [...prev, ...res.data]);
+        setNextCursor(res.headers['x-next-cursor'] ?? null);
+      })
+      .catch(error => console.error("Error fetching history:", error))
+      .finally(() => setIsLoadingMore(false));
+  };
+
   if (!history.length) {
     return null;
   }
@@ -65,6 +81,14 @@ export const DrawingHistory = ({ classroomId, refreshTrigger }: DrawingHistoryPr
           </div>
         ))}
 
+        {isExpanded && nextCursor && (
+          <div className="flex justify-center">
+            <Button variant="flat" size="sm" isLoading={isLoadingMore} onPress={loadMore}>
+              Afficher plus
+            </Button>
+          </div>
+        )}
+
         {history.length > 1 && (
           <div className="flex justify-center mt-4">
             <Button variant="light" onPress={() => setIsExpanded(!isExpanded)}>
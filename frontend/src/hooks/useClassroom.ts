@@ -47,5 +47,79 @@ export const useClassroom = (classroomId: number | null, groupId: number | null
     fetchClassroomData();
   }, [fetchClassroomData]);
 
+  // Live updates pushed by the server, e.g. draws confirmed from another device.
+  useEffect(() => {
+    if (!classroomId || !localStorage.getItem('token')) return;
+
+    let source: EventSource | null = null;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    const updateStudents = (update: (students: Student[]) => Student[]) => {
+      setClassroom(prev => prev && { ...prev, students: withProbabilities(update(prev.students)) });
+    };
+
+    // Tickets are single-use, so every (re)connection asks for a new one
+    // instead of letting EventSource retry with the same URL.
+    const connect = async () => {
+      let ticket: string;
+      try {
+        ticket = (await api.post(`/classrooms/${classroomId}/events/ticket`)).data.ticket;
+      } catch {
+        if (!closed) reconnectTimer = setTimeout(connect, 5000);
+        return;
+      }
+      if (closed) return;
+
+      source = new EventSource(
+        `${api.defaults.baseURL}/classrooms/${classroomId}/events?ticket=${encodeURIComponent(ticket)}`
+      );
+      source.onerror = () => {
+        source?.close();
+        if (!closed) reconnectTimer = setTimeout(connect, 3000);
+      };
+      // The access token expired; the ticket request fails and sends the user to the login page.
+      source.addEventListener('expired', () => {
+        source?.close();
+        connect();
+      });
+      source.addEventListener('draw', (event) => {
+        const changes = new Map<number, Partial<Student>>(
+          JSON.parse((event as MessageEvent).data).students.map((s: Student) => [s.id, s])
+        );
+        updateStudents(students => students.map(s => (changes.has(s.id) ? { ...s, ...changes.get(s.id) } : s)));
+      });
+      source.addEventListener('reset', () => {
+        updateStudents(students => students.map(s => ({ ...s, weight: 1, draw_count: 0 })));
+      });
+      source.addEventListener('students_deleted', (event) => {
+        const deletedIds = new Set<number>(JSON.parse((event as MessageEvent).data).student_ids);
+        updateStudents(students => students.filter(s => !deletedIds.has(s.id)));
+      });
+      source.addEventListener('settings_changed', (event) => {
+        if (JSON.parse((event as MessageEvent).data).key.endsWith(`:${classroomId}`)) fetchClassroomData();
+      });
+      // Edits that change names, groups or weights under the classroom's policy are refetched.
+      for (const name of ['students_created', 'students_updated', 'roster_changed', 'groups_changed', 'classroom_deleted', 'resync']) {
+        source.addEventListener(name, () => fetchClassroomData());
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      source?.close();
+    };
+  }, [classroomId, fetchClassroomData]);
+
   return { classroom, setClassroom, isLoading, error, refetch: fetchClassroomData };
-};
\ No newline at end of file
+};
+
+const withProbabilities = (students: Student[]): Student[] => {
+  const totalWeight = students.reduce((sum, s) => sum + s.weight, 0);
+  return students.map(s => ({
+    ...s,
+    probability: totalWeight > 0 ? s.weight / totalWeight : 1 / students.length,
+  }));
+};
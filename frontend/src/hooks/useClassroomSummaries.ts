@@ -0,0 +1,30 @@
+import { useState, useEffect, useCallback } from 'react';
+import api from '@/lib/api';
+import { ClassroomSummary } from '@/types';
+
+export const useClassroomSummaries = () => {
+  const [classrooms, setClassrooms] = useState<ClassroomSummary[]>([]);
+  const [isLoading, setIsLoading] = useState(true);
+  const [error, setError] = useState<unknown>(null);
+
+  const fetchClassrooms = useCallback(async () => {
+    setIsLoading(true);
+    setError(null);
+    try {
+      const response = await api.get(`/classrooms/summary`);
+      const sortedClassrooms = response.data.sort((a: ClassroomSummary, b: ClassroomSummary) => a.name.localeCompare(b.name));
+      setClassrooms(sortedClassrooms);
+    } catch (err) {
+      setError(err);
+      console.error("Error fetching classrooms:", err);
+    } finally {
+      setIsLoading(false);
+    }
+  }, []);
+
+  useEffect(() => {
+    fetchClassrooms();
+  }, [fetchClassrooms]);
+
+  return { classrooms, isLoading, error, refetch: fetchClassrooms };
+};
@@ -14,7 +14,7 @@ import DefaultLayout from "@/layouts/default";
 import { SlotMachine, SLOT_MACHINE_SPIN_DURATION } from "@/components/SlotMachine";
 import { DrawingHistory } from "@/components/DrawingHistory";
 import { StudentCard } from "@/components/StudentCard";
-import { useClassrooms } from "@/hooks/useClassrooms";
+import { useClassroomSummaries } from "@/hooks/useClassroomSummaries";
 import { useClassroom } from "@/hooks/useClassroom";
 import { Student } from "@/types";
 
@@ -35,14 +35,15 @@ const areSetsEqual = (a: Set<number>, b: Set<number>) => {
 
 export default function DrawerPage() {
   const { isAuthenticated, loading: authLoading } = useAuth();
-  const { classrooms, isLoading: classroomsLoading } = useClassrooms();
+  const { classrooms, isLoading: classroomsLoading } = useClassroomSummaries();
   const [selectedClassroomId, setSelectedClassroomId] = useState<number | null>(null);
   const [selectedGroupId, setSelectedGroupId] = useState<number | null>(null);
 
-  const { classroom, isLoading: studentsLoading, refetch: refetchClassroom } = useClassroom(selectedClassroomId, selectedGroupId);
+  const { classroom, setClassroom, isLoading: studentsLoading } = useClassroom(selectedClassroomId, selectedGroupId);
 
   const [slotMachineStudents, setSlotMachineStudents] = useState<Student[]>([]);
   const [drawnStudents, setDrawnStudents] = useState<(Student | null)[]>([null]);
+  const [drawSessionId, setDrawSessionId] = useState<string | null>(null);
   const [isDrawing, setIsDrawing] = useState(false);
   const [isConfirming, setIsConfirming] = useState(false);
   const [hasConfirmed, setHasConfirmed] = useState(false);
@@ -182,7 +183,8 @@ export default function DrawerPage() {
         student_ids: eligibleStudents.map((student) => student.id),
         group_id: selectedGroupId,
       });
-      setDrawnStudents(response.data);
+      setDrawnStudents(response.data.students);
+      setDrawSessionId(response.data.session_id);
       setSpinId(id => id + 1);
       setIsDrawing(true);
     } catch (error) {
@@ -199,9 +201,12 @@ export default function DrawerPage() {
       return;
     }
     try {
-      await api.post(`/classrooms/${selectedClassroomId}/confirm_draw`, { student_ids });
+      const response = await api.post(`/classrooms/${selectedClassroomId}/confirm_draw`, {
+        student_ids,
+        session_id: drawSessionId,
+      });
       setHasConfirmed(true);
-      refetchClassroom();
+      setClassroom(prev => prev && { ...prev, students: response.data.students });
       setHistoryRefreshTrigger(Date.now());
     } catch (error) {
       console.error("Error confirming draw:", error);
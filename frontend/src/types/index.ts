@@ -34,6 +34,13 @@ export interface Classroom {
   groups: Group[];
 }
 
+export interface ClassroomSummary {
+  id: number;
+  name: string;
+  student_count: number;
+  group_count: number;
+}
+
 export interface DrawingHistory {
     id: number;
     classroom_id: number;